@@ -0,0 +1,135 @@
+import time
+
+from config import HOTWORD_CONFIG
+
+
+class HotwordCache:
+    """缓存 SeACo-Paraformer 热词的处理结果
+
+    funasr 每次推理都把热词文本重新处理一遍: 读模型目录下的 seg_dict、逐词切分转 id，
+    再把整张热词表过一遍偏置编码器(LSTM)。热词不变时这些结果完全相同，
+    这里替换模型实例上的两个方法，只在热词文本变化时重算，之后每次推理直接复用。
+    """
+
+    def __init__(self, model):
+        self.generate = model.generate_hotwords_list
+        self.represent = model._hotword_representation
+        model.generate_hotwords_list = self.generate_hotwords_list
+        model._hotword_representation = self.hotword_representation
+        self.hotword = None
+        self.ids = None
+        self.embedding = None
+        self.embedding_shape = None
+        self.builds = 0
+
+    def generate_hotwords_list(self, hotword, tokenizer=None, frontend=None):
+        if hotword is None:
+            return None
+        if hotword != self.hotword:
+            self.ids = self.generate(hotword, tokenizer=tokenizer, frontend=frontend)
+            self.hotword = hotword
+            self.embedding = None
+            self.builds += 1
+            print(f"热词表已重建: {len(self.ids) - 1}个热词")
+        return self.ids
+
+    def hotword_representation(self, hotword_pad, hotword_lengths):
+        # 填充后的形状随热词表变化，形状不同时说明不是缓存的那张表，重新编码
+        shape = tuple(hotword_pad.shape)
+        if self.embedding is None or shape != self.embedding_shape:
+            self.embedding = self.represent(hotword_pad, hotword_lengths)
+            self.embedding_shape = shape
+        return self.embedding
+
+
+class TorchBackend:
+    """funasr AutoModel + PyTorch 推理（原有路径）
+
+    paraformer-zh 即 SeACo-Paraformer，支持热词偏置；cache_hotwords 时热词只在变化后处理一次。
+    """
+
+    name = 'torch'
+
+    def __init__(self, output_dir="./outputs/debug", device='cpu', model='paraformer-zh', cache_hotwords=True):
+        self.timings = {}
+        # funasr/torch 的导入本身就要数秒，单独计时
+        start_time = time.time()
+        from funasr import AutoModel
+        self.timings['import'] = time.time() - start_time
+
+        start_time = time.time()
+        self.model = AutoModel(
+            model=model,
+            output_dir=output_dir,
+            device=device
+        )
+        self.timings['load'] = time.time() - start_time
+
+        self.hotword_cache = None
+        inner = self.model.model
+        if not hasattr(inner, 'generate_hotwords_list'):
+            print(f"模型 {type(inner).__name__} 不支持热词，热词不会生效")
+        elif cache_hotwords:
+            self.hotword_cache = HotwordCache(inner)
+
+    def generate(self, input_data, hotword=None):
+        return self.model.generate(input=input_data, batch_size_s=300, hotword=hotword)
+
+    def generate_batch(self, inputs, hotword=None):
+        return self.model.generate(input=list(inputs), batch_size=len(inputs),
+                                   batch_size_s=300, hotword=hotword)
+
+
+class OnnxBackend:
+    """funasr_onnx + ONNX Runtime 推理，可用 int8 量化模型
+
+    model_dir 可以是本地导出的目录，也可以是 modelscope 模型名，
+    首次使用时由 funasr_onnx 自动下载并导出（需要安装 funasr 与 modelscope）。
+    该路径不支持热词，hotword 参数会被忽略。
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_dir, quantize=True, intra_op_num_threads=4):
+        self.timings = {}
+        start_time = time.time()
+        from funasr_onnx import Paraformer
+        self.timings['import'] = time.time() - start_time
+
+        start_time = time.time()
+        self.model = Paraformer(model_dir, batch_size=1, quantize=quantize,
+                                intra_op_num_threads=intra_op_num_threads)
+        self.timings['load'] = time.time() - start_time
+
+    def generate(self, input_data, hotword=None):
+        return self.generate_batch([input_data])
+
+    def generate_batch(self, inputs, hotword=None):
+        # funasr_onnx 只对路径列表做批处理，数组逐段送入
+        results = []
+        for i, samples in enumerate(inputs):
+            res = self.model(samples)
+            results.append({'key': f'onnx_{i}', 'text': _onnx_text(res)})
+        return results
+
+
+def _onnx_text(res):
+    """不同版本的 funasr_onnx 返回格式不同，统一取出文本"""
+    if not res:
+        return ''
+    preds = res[0].get('preds', '') if isinstance(res[0], dict) else res[0]
+    if isinstance(preds, (list, tuple)):
+        preds = preds[0]
+    return preds
+
+
+def create_backend(config, output_dir="./outputs/debug", device='cpu'):
+    """按 ASR_CONFIG 构建推理后端"""
+    backend = config['BACKEND']
+    if backend == 'torch':
+        return TorchBackend(output_dir=output_dir, device=device, model=config['TORCH_MODEL'],
+                            cache_hotwords=HOTWORD_CONFIG['CACHE'])
+    if backend == 'onnx':
+        return OnnxBackend(config['ONNX_MODEL_DIR'], quantize=config['ONNX_QUANTIZE'],
+                           intra_op_num_threads=config['ONNX_THREADS'])
+    raise ValueError(f"未知的推理后端: {backend}")
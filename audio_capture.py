@@ -1,49 +1,57 @@
 import pyaudio
 import webrtcvad
 import time
+import threading
+from queue import SimpleQueue, Empty, Full
 from multiprocessing import Queue, Event
 from config import AUDIO_CONFIG
+from ring_buffer import AudioRingBuffer
+from endpointing import VadEndpointer
+from audio_segment import AudioSegment
+from audio_source import MicrophoneSource
+from cpu_placement import apply_placement
+from latency_trace import Tracer, ONSET, ENDPOINT
+from metrics import NULL_METRICS
+from supervisor import NULL_HEARTBEAT
 
 
 class AudioCapture:
-    def __init__(self, audio_queue: Queue, stop_event: Event):
+    def __init__(self, audio_queue: Queue, stop_event: Event, streaming=False, placement_queue: Queue = None,
+                 trace_queue: Queue = None, source=None, metrics=None, heartbeat=None):
         self.audio_queue = audio_queue
         self.stop_event = stop_event
-        self.pyaudio = None
+        self.streaming = streaming
+        self.placement_queue = placement_queue
+        self.tracer = Tracer(trace_queue)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        # 音频回调每块心跳一次，主管据此发现音频流中断
+        self.heartbeat = heartbeat if heartbeat is not None else NULL_HEARTBEAT
+        # 音频来源，默认是麦克风；基准测试时换成 WavReplaySource
+        self.source = source if source is not None else MicrophoneSource(AUDIO_CONFIG['INPUT_DEVICE_INDEX'])
         self.vad = None
-        self.stream = None
         self.callback_handler = None
-
-    def find_low_latency_device(self):
-        """尝试找到低延迟的音频输入设备"""
-        default_device = self.pyaudio.get_default_input_device_info()
-        return default_device["index"]
+        self.dispatch_thread = None
 
     def start(self):
         """启动音频采集"""
         print("音频采集进程启动")
+        # 先绑核，之后创建的回调和发送线程会继承
+        apply_placement('AUDIO', report_queue=self.placement_queue)
         self.vad = webrtcvad.Vad(AUDIO_CONFIG['VAD_AGGRESSIVENESS'])
-        self.pyaudio = pyaudio.PyAudio()
-        # 设置输入设备
-        input_device_index = (AUDIO_CONFIG['INPUT_DEVICE_INDEX'] if AUDIO_CONFIG['INPUT_DEVICE_INDEX']
-                              else self.find_low_latency_device())
-        print(f"使用音频设备: {input_device_index}")
 
         # 创建回调处理器
-        self.callback_handler = AudioCallbackHandler(self.vad, self.audio_queue)
-
-        # 打开音频流
-        self.stream = self.pyaudio.open(
-            format=AUDIO_CONFIG['FORMAT'],
-            channels=AUDIO_CONFIG['CHANNELS'],
-            rate=AUDIO_CONFIG['RATE'],
-            input=True,
-            output=False,
-            frames_per_buffer=AUDIO_CONFIG['CHUNK'],
-            stream_callback=self.callback_handler.callback
-        )
+        if self.streaming:
+            self.callback_handler = StreamingAudioCallbackHandler(self.vad, self.audio_queue, self.heartbeat)
+        else:
+            self.callback_handler = AudioCallbackHandler(self.vad, self.audio_queue, self.heartbeat)
 
-        self.stream.start_stream()
+        # 打开音频源，之后每块音频都会进入回调
+        self.source.start(self.callback_handler.callback)
+
+        # 整句送往识别进程的工作放在独立线程，回调里只做VAD判断和内存拷贝
+        if not self.streaming:
+            self.dispatch_thread = threading.Thread(target=self.dispatch_segments, daemon=True)
+            self.dispatch_thread.start()
 
         # 等待停止事件
         while not self.stop_event.is_set():
@@ -51,38 +59,103 @@ class AudioCapture:
 
         self.cleanup()
 
+    def dispatch_segments(self):
+        """从环形缓冲区取出完整语音段，放入进程间队列"""
+        handler = self.callback_handler
+        while not self.stop_event.is_set():
+            try:
+                start, end, onset, endpoint, trace_id = handler.segments.get(timeout=0.1)
+            except Empty:
+                continue
+            # 打点放在发送线程里做，不占用回调时间
+            self.tracer.stamp(trace_id, ONSET, onset, position=start)
+            self.tracer.stamp(trace_id, ENDPOINT, endpoint)
+            try:
+                audio_buffer = handler.ring.read(start, end)
+            except IndexError:
+                print("语音段在发送前已被覆盖，丢弃")
+                self.metrics.inc('voice_segments_dropped_total')
+                continue
+            try:
+                self.audio_queue.put(AudioSegment(audio_buffer, onset, endpoint, trace_id), timeout=0.1)
+                self.metrics.inc('voice_segments_total')
+            except Full:
+                print("音频队列已满，丢弃语音段")
+                self.metrics.inc('voice_segments_dropped_total')
+
     def cleanup(self):
         """清理资源"""
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-        if self.pyaudio:
-            self.pyaudio.terminate()
+        self.source.close()
         print("音频采集进程结束")
 
 
 class AudioCallbackHandler:
     """处理音频回调的类"""
 
-    def __init__(self, vad, audio_queue):
+    def __init__(self, vad, audio_queue, heartbeat=NULL_HEARTBEAT):
         self.vad = vad
         self.audio_queue = audio_queue
-        self.audio_buffer = b''
-        self.silence_frames = 0
-        self.MAX_SILENCE_FRAMES = 0
+        self.heartbeat = heartbeat
+        # 所有音频都写入预分配的环形缓冲区（预录需要语音前的数据），
+        # 完整语音段以 (起点, 终点) 交给发送线程
+        self.ring = AudioRingBuffer(int(AUDIO_CONFIG['RATE'] * 2 * AUDIO_CONFIG['RING_BUFFER_SECONDS']))
+        self.segments = SimpleQueue()
+        self.bytes_per_second = AUDIO_CONFIG['RATE'] * 2
+        self.last_trace_id = 0  # 每个语音段分配一个递增的 trace id
+        self.endpointer = VadEndpointer(
+            vad, AUDIO_CONFIG['RATE'], AUDIO_CONFIG['CHUNK'] * 2,
+            pre_roll_ms=AUDIO_CONFIG['PRE_ROLL_MS'],
+            hangover_ms=AUDIO_CONFIG['HANGOVER_MS'],
+            max_segment_ms=AUDIO_CONFIG['MAX_SEGMENT_MS'],
+            min_speech_ms=AUDIO_CONFIG['MIN_SPEECH_MS'],
+            energy_threshold=AUDIO_CONFIG['ENERGY_THRESHOLD'],
+        )
 
     def callback(self, in_data, frame_count, time_info, status):
         """PyAudio回调函数，处理音频数据"""
+        self.heartbeat.beat()
+        position = self.ring.write(in_data)
+        segment = self.endpointer.update(in_data, position)
+        if segment is not None:
+            # 由段长倒推语音起点时刻，采集和识别进程共用 time.monotonic 时钟
+            start, end = segment
+            now = time.monotonic()
+            self.last_trace_id += 1
+            self.segments.put((start, end, now - (end - start) / self.bytes_per_second, now, self.last_trace_id))
+
+        return (None, pyaudio.paContinue)
+
+
+class StreamingAudioCallbackHandler:
+    """流式模式的音频回调，把10ms小块直接送给识别进程
+
+    队列里的元素为 (音频块, 是否为本句最后一块, 采集时刻 time.monotonic)。
+    """
+
+    def __init__(self, vad, audio_queue, heartbeat=NULL_HEARTBEAT):
+        self.vad = vad
+        self.audio_queue = audio_queue
+        self.heartbeat = heartbeat
+        self.in_speech = False
+        self.silence_frames = 0
+        self.MAX_SILENCE_FRAMES = AUDIO_CONFIG['STREAMING_END_SILENCE_FRAMES']
+
+    def callback(self, in_data, frame_count, time_info, status):
+        """PyAudio回调函数，逐块转发语音"""
+        self.heartbeat.beat()
+        now = time.monotonic()
         if self.vad.is_speech(in_data, AUDIO_CONFIG['RATE']):
-            self.audio_buffer += in_data
+            self.in_speech = True
             self.silence_frames = 0
-        else:
+            self.audio_queue.put((in_data, False, now))
+        elif self.in_speech:
+            # 句中短暂停顿也送过去，流式模型需要连续的音频
             self.silence_frames += 1
-
-        # 如果连续静音时间够长，认为一句话结束
-        if self.silence_frames > self.MAX_SILENCE_FRAMES and len(self.audio_buffer) > 0:
-            self.audio_queue.put(self.audio_buffer)
-            self.audio_buffer = b''
-            self.silence_frames = 0
+            if self.silence_frames > self.MAX_SILENCE_FRAMES:
+                self.audio_queue.put((b'', True, now))
+                self.in_speech = False
+                self.silence_frames = 0
+            else:
+                self.audio_queue.put((in_data, False, now))
 
         return (None, pyaudio.paContinue)
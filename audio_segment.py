@@ -0,0 +1,11 @@
+from collections import namedtuple
+
+import numpy as np
+
+# 采集端送往识别进程的一段语音: 16bit PCM 数据、语音起点和断句时刻（time.monotonic）、trace id
+AudioSegment = namedtuple('AudioSegment', ['pcm', 'onset', 'endpoint', 'trace_id'], defaults=[None])
+
+
+def pcm_to_float(pcm):
+    """16bit PCM 转成模型需要的 float32 数组，同时把数据拷出共享内存"""
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
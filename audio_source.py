@@ -0,0 +1,117 @@
+import time
+import wave
+import threading
+
+from config import AUDIO_CONFIG
+
+
+class MicrophoneSource:
+    """PyAudio 麦克风输入，每采到一块就调用 callback(in_data, frame_count, time_info, status)"""
+
+    def __init__(self, input_device_index=None):
+        self.input_device_index = input_device_index
+        self.pyaudio = None
+        self.stream = None
+
+    def find_low_latency_device(self):
+        """尝试找到低延迟的音频输入设备"""
+        default_device = self.pyaudio.get_default_input_device_info()
+        return default_device["index"]
+
+    def start(self, callback):
+        import pyaudio
+        self.pyaudio = pyaudio.PyAudio()
+        # 设置输入设备
+        input_device_index = (self.input_device_index if self.input_device_index
+                              else self.find_low_latency_device())
+        print(f"使用音频设备: {input_device_index}")
+
+        # 打开音频流
+        self.stream = self.pyaudio.open(
+            format=AUDIO_CONFIG['FORMAT'],
+            channels=AUDIO_CONFIG['CHANNELS'],
+            rate=AUDIO_CONFIG['RATE'],
+            input=True,
+            output=False,
+            frames_per_buffer=AUDIO_CONFIG['CHUNK'],
+            stream_callback=callback
+        )
+        self.stream.start_stream()
+
+    def close(self):
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+        if self.pyaudio:
+            self.pyaudio.terminate()
+
+
+class WavReplaySource:
+    """把本地录音按 CHUNK 大小切块回放，接口与 MicrophoneSource 相同
+
+    realtime=True 时按绝对截止时间每 10ms 送一块，模拟真实采集节奏；
+    否则尽快送完，用于测吞吐。每个文件后补一段静音，让断句能正常结束。
+    每个文件的语音部分送完后往 played_queue 放 (路径, 开始 monotonic, 结束 monotonic, 起点字节, 终点字节)，
+    字节位置是从回放开始累计的，与采集端环形缓冲区的位置一致；全部送完后设置 done_event。
+    """
+
+    def __init__(self, paths, realtime=True, gap_ms=500, done_event=None, played_queue=None):
+        self.paths = list(paths)
+        self.realtime = realtime
+        self.gap_ms = gap_ms
+        self.done_event = done_event
+        self.played_queue = played_queue
+        self.thread = None
+        self.closed = None  # 在采集进程里创建，保证对象本身可以传给子进程
+
+    def load(self, path):
+        """读出 16bit 单声道 PCM，采样率与配置不符时直接报错"""
+        with wave.open(path, 'rb') as wav_file:
+            if (wav_file.getframerate() != AUDIO_CONFIG['RATE'] or wav_file.getnchannels() != 1
+                    or wav_file.getsampwidth() != 2):
+                raise ValueError(f"{path}: 需要 {AUDIO_CONFIG['RATE']}Hz 16bit 单声道录音")
+            return wav_file.readframes(-1)
+
+    def start(self, callback):
+        # 启动前读完全部文件，回放时不再碰磁盘
+        clips = [(path, self.load(path)) for path in self.paths]
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(clips, callback), daemon=True)
+        self.thread.start()
+
+    def run(self, clips, callback):
+        chunk = AUDIO_CONFIG['CHUNK']
+        step = chunk * 2
+        period_ns = chunk * 1_000_000_000 // AUDIO_CONFIG['RATE']
+        gap = b'\x00\x00' * (AUDIO_CONFIG['RATE'] * self.gap_ms // 1000)
+        sent = 0
+        start_ns = time.perf_counter_ns()
+        for path, pcm in clips:
+            clip_start = time.monotonic()
+            clip_position = sent * step
+            # 不足一块的尾巴补零，保证每块大小与麦克风一致
+            data = pcm + gap + b'\x00' * (-(len(pcm) + len(gap)) % step)
+            for i in range(0, len(data), step):
+                if self.closed.is_set():
+                    return
+                if self.realtime:
+                    deadline = start_ns + sent * period_ns
+                    remaining = deadline - time.perf_counter_ns()
+                    if remaining > 0:
+                        time.sleep(remaining / 1e9)
+                callback(data[i:i + step], chunk, None, 0)
+                sent += 1
+                if i + step >= len(pcm) and clip_start is not None:
+                    # 语音部分送完即为该文件的结束时刻，后面是补的静音
+                    if self.played_queue is not None:
+                        self.played_queue.put((path, clip_start, time.monotonic(),
+                                               clip_position, clip_position + len(pcm)))
+                    clip_start = None
+        if self.done_event is not None:
+            self.done_event.set()
+
+    def close(self):
+        if self.closed is not None:
+            self.closed.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
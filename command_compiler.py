@@ -0,0 +1,112 @@
+from collections import namedtuple
+
+# 时间轴事件动作
+PRESS = 'press'
+RELEASE = 'release'
+TURN = 'turn'
+
+# 单个定时事件: 相对指令起点的帧偏移、动作、按键
+TimedEvent = namedtuple('TimedEvent', ['frame', 'action', 'key'])
+
+# 编译后的指令: 名称、按时间排序的事件元组、总帧数、按帧分组的 (帧, 事件元组) 元组
+CompiledCommand = namedtuple('CompiledCommand', ['name', 'events', 'length', 'frames'])
+
+
+class CommandCompileError(ValueError):
+    """指令映射编译错误"""
+
+
+def compile_commands(mapping):
+    """启动时把指令映射编译成扁平的定时事件表
+
+    返回 {指令名: CompiledCommand}，映射里的错误（未知引用、循环嵌套、
+    非法的放帧写法）在这里直接抛出 CommandCompileError。
+    """
+    compiled = {}
+    for name in mapping:
+        _compile(name, mapping, compiled, [])
+    return compiled
+
+
+def command_keys(compiled):
+    """编译结果里用到的全部按键"""
+    return {e.key for command in compiled.values() for e in command.events if e.key is not None}
+
+
+def _compile(name, mapping, compiled, stack):
+    """编译单条指令，stack 为当前嵌套链，用于检测循环引用"""
+    if name in compiled:
+        return compiled[name]
+    if name in stack:
+        chain = " -> ".join(stack + [name])
+        raise CommandCompileError(f"指令存在循环嵌套: {chain}")
+    if name not in mapping:
+        where = f"（被 {stack[-1]} 引用）" if stack else ""
+        raise CommandCompileError(f"未知指令: {name}{where}")
+
+    stack.append(name)
+    events = []
+    frame = 0
+    for step in mapping[name]:
+        if isinstance(step, tuple):
+            # 同时按键，按住一帧
+            for k in step:
+                _check_key(name, k)
+                events.append(TimedEvent(frame, PRESS, k))
+            for k in step:
+                events.append(TimedEvent(frame + 1, RELEASE, k))
+            frame += 1
+        elif not isinstance(step, str):
+            raise CommandCompileError(f"指令 {name} 含有无法识别的步骤: {step!r}")
+        elif not step:
+            # 空字符串表示空等一帧
+            frame += 1
+        elif step.startswith("#"):
+            # 放帧
+            frame += _parse_wait(name, step)
+        elif step.startswith("$"):
+            # 嵌套指令，直接展开到当前时间轴
+            sub = _compile(step[1:], mapping, compiled, stack)
+            events.extend(TimedEvent(frame + e.frame, e.action, e.key) for e in sub.events)
+            frame += sub.length
+        elif step == "@":
+            events.append(TimedEvent(frame, TURN, None))
+        else:
+            events.append(TimedEvent(frame, PRESS, step))
+            events.append(TimedEvent(frame + 1, RELEASE, step))
+            frame += 1
+    stack.pop()
+
+    # 同一帧内先松开再按下，保证相邻的同键输入能被识别为两次
+    order = {RELEASE: 0, TURN: 1, PRESS: 2}
+    events.sort(key=lambda e: (e.frame, order[e.action]))
+    compiled[name] = CompiledCommand(name, tuple(events), frame, _group_frames(events))
+    return compiled[name]
+
+
+def _group_frames(events):
+    """把已排序的事件按帧分组，同一帧的按键可以一次性发出"""
+    frames = []
+    for event in events:
+        if frames and frames[-1][0] == event.frame:
+            frames[-1][1].append(event)
+        else:
+            frames.append((event.frame, [event]))
+    return tuple((frame, tuple(group)) for frame, group in frames)
+
+
+def _parse_wait(name, step):
+    """解析 "#N" 放帧写法"""
+    try:
+        num = int(step[1:])
+    except ValueError:
+        raise CommandCompileError(f"指令 {name} 的放帧写法非法: {step!r}") from None
+    if num < 0:
+        raise CommandCompileError(f"指令 {name} 的放帧数不能为负: {step!r}")
+    return num
+
+
+def _check_key(name, key):
+    """同时按键里只能是普通按键"""
+    if not isinstance(key, str) or not key or key[0] in "#$@":
+        raise CommandCompileError(f"指令 {name} 的同时按键非法: {key!r}")
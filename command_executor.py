@@ -1,81 +1,307 @@
 import time
-import keyboard
 from queue import Empty
 from threading import Event
 from multiprocessing import Queue
-from config import COMMAND_MAPPING, PLAYER_CONFIG
+import threading
+from collections import namedtuple
+from config import (PLAYER_CONFIG, EXECUTOR_CONFIG, COMMAND_QUEUE_CONFIG, COMMAND_LIBRARY_CONFIG,
+                    SPECULATION_CONFIG)
+from command_compiler import command_keys, PRESS, RELEASE, TURN
+from command_library import load_library, CommandLibraryWatcher
+from command_request import SpeculationRequest
+from command_scheduler import DeadlineCommandQueue
+from frame_scheduler import FrameScheduler, summarize_timings
+from key_output import create_output
+from cpu_placement import apply_placement
+from latency_trace import Tracer, FIRST_PRESS, LAST_RELEASE
+from metrics import NULL_METRICS
+
+# 推测等待超时时已经完整输入的前缀: 所属语音的 trace id、候选指令、已输入的帧分组数、
+# 前缀开始的时刻(perf_counter_ns / monotonic)、前缀的按键延迟、输入前缀后的人物朝向
+PlayedPrefix = namedtuple('PlayedPrefix', ['trace_id', 'candidates', 'done', 'start_ns', 'mono_start', 'timings',
+                                           'location'])
+
 
 class CommandExecutor:
-    def __init__(self, command_queue: Queue, stop_event: Event):
+    def __init__(self, command_queue: Queue, stop_event: Event, placement_queue: Queue = None,
+                 trace_queue: Queue = None, output=None, library_path=None, location=None, metrics=None):
         self.command_queue = command_queue
         self.stop_event = stop_event
-        self.location = PLAYER_CONFIG['LOCATION']
-        self.zhen_s = 0.017 #每帧秒数
+        self.placement_queue = placement_queue
+        self.tracer = Tracer(trace_queue)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.location = location or PLAYER_CONFIG['LOCATION']
+        self.scheduler = FrameScheduler(EXECUTOR_CONFIG['FPS'], EXECUTOR_CONFIG['SPIN_MS'])
+        self.last_timings = []  # 最近一次执行中每个事件的触发延迟
+        # 启动时加载并编译指令库，映射有误直接在这里报错；运行中由监视线程热更新
+        self.library_path = library_path
+        self.library = load_library(library_path)
+        self.next_library = None
+        self.commands = self.library.compiled
+        # 真正发出按键的后端，键码表按指令里出现的按键预先算好
+        self.output = output if output is not None else create_output(EXECUTOR_CONFIG, command_keys(self.commands))
+        self.held = set()  # 当前按住的键码，时间轴被打断时据此全部松开
+        self.prefixes = {}  # 候选指令集合 -> 共同前缀的帧分组，指令库更新时清空
+        self.played = None  # 推测超时时已完整输入的前缀(PlayedPrefix)，同一句话迟到的最终指令从它之后接着执行
+        self.sequence_start = None  # 一句多条指令时，第一条开始执行的时刻，后面的按说话间隔对齐到它
+        # 识别进程送来的指令先进本地队列，过期丢弃、优先指令插队
+        self.pending = DeadlineCommandQueue(
+            COMMAND_QUEUE_CONFIG['TTL_MS'],
+            COMMAND_QUEUE_CONFIG['PRIORITY_COMMANDS'],
+            COMMAND_QUEUE_CONFIG['COMMAND_TTL_MS'],
+            COMMAND_QUEUE_CONFIG['MAX_PENDING'],
+            self.metrics,
+        )
 
     def start(self):
         """启动指令执行线程"""
         print("指令执行线程启动")
+        apply_placement('EXECUTOR', thread=True, report_queue=self.placement_queue)
+        # 执行时间轴期间也要收指令，才能让优先指令及时打断
+        threading.Thread(target=self.receive_commands, daemon=True).start()
+        if COMMAND_LIBRARY_CONFIG['WATCH']:
+            CommandLibraryWatcher(self.on_library_change, self.stop_event, self.library_path,
+                                  digest=self.library.digest).start()
 
         while not self.stop_event.is_set():
-            try:
-                command = self.command_queue.get(timeout=0.1)
-                print(f"执行指令: {command}")
-                start_time = time.time()
-                self.execute_command(command)
-                execution_time = time.time() - start_time
-                print(f"执行用时: {execution_time:.4f}秒")
-            except Empty:
+            self.apply_pending_library()
+            request = self.pending.get(timeout=0.1)
+            if request is None:
                 continue
+            self.metrics.set('voice_command_queue_depth', len(self.pending))
+            try:
+                self.handle(request)
             except Exception as e:
                 print(f"指令执行错误: {e}")
+                self.release_held()
+        self.release_held()
+        self.output.close()
+        print(f"指令队列: 过期丢弃 {self.pending.expired} 条，被优先指令取消 {self.pending.cancelled} 条")
+
+    def handle(self, request):
+        """执行一条正式指令或推测请求"""
+        played, self.played = self.played, None
+        if isinstance(request, SpeculationRequest):
+            self.speculate(request)
+            return
+        if (played is not None and request.trace_id is not None and request.trace_id == played.trace_id
+                and request.name in played.candidates):
+            self.location = played.location
+            self.commit_speculation(request, played.done, played.start_ns, played.mono_start, played.timings)
+            return
+        self.wait_offset(request)
+        self.metrics.inc('voice_commands_total')
+        print(f"执行指令: {request.name}")
+        start_time = time.time()
+        self.execute_command(request.name, request.trace_id)
+        execution_time = time.time() - start_time
+        print(f"执行用时: {execution_time:.4f}秒")
+
+    def wait_offset(self, request):
+        """同一句话里的多条指令按说话时的相对间隔执行；前一条执行得久时不再等待，优先指令到达时立即结束等待"""
+        if request.offset is None:
+            return
+        now = time.monotonic()
+        if request.offset == 0 or self.sequence_start is None:
+            self.sequence_start = now - request.offset
+            return
+        delay = self.sequence_start + request.offset - now
+        if delay > 0:
+            self.pending.preempt.wait(delay)
+
+    def on_library_change(self, library):
+        """监视线程回调，只记下最新的指令库"""
+        self.next_library = library
+
+    def apply_pending_library(self):
+        """在两条指令之间切换到新的时间轴和键码表，正在执行的指令不受影响"""
+        library = self.next_library
+        if library is None or library is self.library:
+            return
+        try:
+            self.output.set_keys(command_keys(library.compiled))
+        except ValueError as e:
+            print(f"指令库未生效: {e}")
+            self.next_library = None
+            return
+        self.library = library
+        self.commands = library.compiled
+        self.prefixes = {}
+        self.played = None
+        print(f"指令库已更新: {len(library.compiled)}条指令")
+
+    def receive_commands(self):
+        """把进程间队列里的指令转入本地的截止时间队列"""
+        while not self.stop_event.is_set():
+            try:
+                self.pending.put(self.command_queue.get(timeout=0.1))
+            except Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+    def execute_command(self, command, trace_id=None):
+        """执行指令，按编译好的时间轴以绝对截止时间回放"""
+        compiled = self.commands.get(command)
+        if compiled is None:
+            return
+
+        # 同时取两种时钟，把 perf_counter 上的触发时刻换算到跨进程可比的 monotonic
+        start_ns = time.perf_counter_ns()
+        mono_start = time.monotonic()
+        self.last_timings = self.scheduler.run(compiled.frames, self.fire, compiled.length, start_ns,
+                                               self.pending.preempt.is_set)
+        if len(self.last_timings) < len(compiled.events):
+            print(f"指令 {command} 被优先指令打断")
+            self.release_held()
+        self.trace_keys(trace_id, mono_start)
+        self.observe_timings()
+        if EXECUTOR_CONFIG['REPORT_TIMING']:
+            count, mean_ms, max_ms = summarize_timings(self.last_timings)
+            print(f"按键延迟: {count}个事件 平均{mean_ms:.3f}ms 最大{max_ms:.3f}ms")
+
+    def common_prefix(self, candidates):
+        """候选指令时间轴完全相同的前若干帧，有未知指令时返回空元组"""
+        key = frozenset(candidates)
+        if key not in self.prefixes:
+            if not all(name in self.commands for name in key):
+                return ()
+            timelines = [self.commands[name].frames for name in key]
+            count = 0
+            # 只按整帧比较，同时按键不会被拆到前缀和分支两边
+            while all(count < len(t) and t[count] == timelines[0][count] for t in timelines):
+                count += 1
+            self.prefixes[key] = timelines[0][:count]
+        return self.prefixes[key]
 
-    def execute_command(self, command):
-        """执行指令"""
-        if command not in COMMAND_MAPPING:
+    def speculate(self, request):
+        """先输入候选指令共同的前缀，最终指令到达后接着走对应分支，落空或等待超时则松开所有键"""
+        prefix = self.common_prefix(request.candidates)
+        # prefix 按帧分组，"#N" 放帧不占分组，前缀覆盖的帧数以最后一组的帧号为准
+        frames = prefix[-1][0] + 1 if prefix else 0
+        if frames < SPECULATION_CONFIG['MIN_PREFIX_FRAMES']:
             return
-        
-        keys = COMMAND_MAPPING[command]
-        for key in keys:
-            if isinstance(key, tuple):
-                # 处理同时按键
-                for k in key:
-                    self.press(k)
-                time.sleep(self.zhen_s)
-                for k in key:
-                    self.release(k)
-            elif key:
-                if key.startswith("#"):
-                    # 处理放帧
-                    num = int(key.split("#")[1])
-                    time.sleep(1.0 / 60 * num)
-                elif key.startswith("$"):
-                    # 处理嵌套指令
-                    cmd = key.split("$")[1]
-                    self.execute_command(cmd)
-                elif key == "@":
-                    self.location = 'right' if self.location == 'left' else 'left'
+        print(f"推测执行: {'/'.join(sorted(request.candidates))} 共同前缀{frames}帧")
+        location = self.location  # 前缀里可能有转向，落空时要恢复
+        candidates = set(request.candidates)
+        start_ns = time.perf_counter_ns()
+        mono_start = time.monotonic()
+        done = 0  # 已经输入的帧分组数
+        prefix_timings = []
+        hold_ns = int(SPECULATION_CONFIG['MAX_HOLD_MS'] * 1_000_000)
+        while True:
+            timings = self.scheduler.run(prefix[done:], self.fire, 0, start_ns, self.pending.preempt.is_set)
+            prefix_timings += timings
+            if len(timings) < sum(len(events) for _, events in prefix[done:]):
+                # 优先指令打断，交给主循环处理
+                self.abort_speculation(location)
+                return
+            done = len(prefix)
+            # 前缀输入完后最多保持 MAX_HOLD_MS 等待最终结果
+            remaining = (start_ns + self.scheduler.frame_offset_ns(prefix[-1][0]) + hold_ns - time.perf_counter_ns()) / 1e9
+            following = self.pending.get(timeout=remaining) if remaining > 0 else None
+            if following is None:
+                complete = [name for name in candidates if self.commands[name].frames == prefix]
+                if complete and not self.held:
+                    # 前缀本身就是一条完整指令(中拳/中拳重拳)，匹配器要等扩展超时才提交它，
+                    # 迟到的最终指令不再从头输入，而是接着已输入的前缀执行
+                    print(f"推测等待超时: 已完整输入 {complete[0]}，同一句话的最终指令接着它执行")
+                    self.played = PlayedPrefix(request.trace_id, candidates, done, start_ns, mono_start,
+                                               prefix_timings, self.location)
                 else:
-                    # 处理单个按键
-                    self.press(key)
-                    time.sleep(self.zhen_s)
-                    self.release(key)
+                    print("推测落空: 等待最终指令超时")
+                self.abort_speculation(location)
+                return
+            if isinstance(following, SpeculationRequest):
+                extended = self.common_prefix(following.candidates)
+                if extended[:done] == prefix[:done] and len(extended) >= done:
+                    # 候选收窄，前缀变长，接着输入多出来的帧
+                    prefix = extended
+                    candidates = set(following.candidates)
+                    continue
+                self.abort_speculation(location)
+                self.speculate(following)
+                return
+            if following.name not in candidates:
+                print(f"推测落空: 最终指令 {following.name}")
+                self.abort_speculation(location)
+                self.handle(following)
+                return
+            self.commit_speculation(following, done, start_ns, mono_start, prefix_timings)
+            return
+
+    def commit_speculation(self, request, done, start_ns, mono_start, prefix_timings):
+        """从已输入的前缀之后接着执行最终指令；结果来得晚时整体顺延，保持分支内部的相对帧距"""
+        compiled = self.commands[request.name]
+        rest = compiled.frames[done:]
+        branch_start_ns = start_ns
+        if rest:
+            deadline = start_ns + self.scheduler.frame_offset_ns(rest[0][0])
+            now = time.perf_counter_ns()
+            if now > deadline:
+                branch_start_ns = now - self.scheduler.frame_offset_ns(rest[0][0])
+        print(f"推测命中: {request.name}，跳过已输入的{done}个帧分组")
+        timings = self.scheduler.run(rest, self.fire, compiled.length, branch_start_ns, self.pending.preempt.is_set)
+        if len(timings) < sum(len(events) for _, events in rest):
+            print(f"指令 {request.name} 被优先指令打断")
+            self.release_held()
+        self.last_timings = prefix_timings + timings
+        self.trace_keys(request.trace_id, mono_start, prefix_timings, stamp_release=False)
+        self.trace_keys(request.trace_id, mono_start + (branch_start_ns - start_ns) / 1e9, timings, stamp_press=False)
+        self.metrics.inc('voice_commands_total')
+        self.observe_timings()
+        if EXECUTOR_CONFIG['REPORT_TIMING']:
+            count, mean_ms, max_ms = summarize_timings(self.last_timings)
+            print(f"按键延迟: {count}个事件 平均{mean_ms:.3f}ms 最大{max_ms:.3f}ms")
+
+    def abort_speculation(self, location):
+        """松开推测输入按住的键，恢复人物朝向"""
+        self.release_held()
+        self.location = location
+
+    def observe_timings(self):
+        """把最近一次执行中每个事件的触发误差记入直方图"""
+        for timing in self.last_timings:
+            self.metrics.observe('voice_key_timing_error_ms', timing.late_ns / 1e6)
+
+    def trace_keys(self, trace_id, mono_start, timings=None, stamp_press=True, stamp_release=True):
+        """记录首个按下和最后一个释放的实际时刻"""
+        if trace_id is None:
+            return
+        timings = self.last_timings if timings is None else timings
+        presses = [t for t in timings if t.action == PRESS] if stamp_press else []
+        releases = [t for t in timings if t.action == RELEASE] if stamp_release else []
+        if presses:
+            first = presses[0]
+            offset = self.scheduler.frame_offset_ns(first.frame) + first.late_ns
+            self.tracer.stamp(trace_id, FIRST_PRESS, mono_start + offset / 1e9, key=first.key)
+        if releases:
+            last = releases[-1]
+            offset = self.scheduler.frame_offset_ns(last.frame) + last.late_ns
+            self.tracer.stamp(trace_id, LAST_RELEASE, mono_start + offset / 1e9, key=last.key)
+
+    def fire(self, events):
+        """把同一帧的事件转换成键码后一次交给输出后端"""
+        table = self.output.tables[self.location]
+        actions = []
+        for event in events:
+            if event.action == TURN:
+                # 同一帧里转向排在松开之后、按下之前
+                self.location = 'right' if self.location == 'left' else 'left'
+                table = self.output.tables[self.location]
+            elif event.action == PRESS:
+                code = table[event.key]
+                actions.append((code, True))
+                self.held.add(code)
             else:
-                time.sleep(self.zhen_s)
-
-    def press(self, key):
-        """按下按键"""
-        keyboard.press(self.key_map_by_location(key))
-
-    def release(self, key):
-        """释放按键"""
-        keyboard.release(self.key_map_by_location(key))
-
-    def key_map_by_location(self, key):
-        """根据位置映射按键"""
-        if self.location == 'right':
-            # ad互换
-            if key == 'd':
-                return 'a'
-            elif key == 'a':
-                return 'd'
-        return key
\ No newline at end of file
+                code = table[event.key]
+                actions.append((code, False))
+                self.held.discard(code)
+        if actions:
+            self.output.send(actions)
+
+    def release_held(self):
+        """松开所有仍按住的键"""
+        if self.held:
+            self.output.send([(code, False) for code in self.held])
+            self.held.clear()
@@ -0,0 +1,126 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import namedtuple
+
+from command_compiler import compile_commands, CommandCompileError
+from phonetic_index import PhoneticIndex
+from command_segmenter import CommandSegmenter
+from config import COMMAND_LIBRARY_CONFIG, FUZZY_CONFIG
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# 编译结果的格式或依赖的配置变化时加一，旧缓存随之失效
+CACHE_VERSION = 2
+
+# 加载好的指令库: 文件内容哈希、指令映射、编译后的时间轴、拼音模糊索引（未启用时为 None）、整句切分器
+CommandLibrary = namedtuple('CommandLibrary', ['digest', 'mapping', 'compiled', 'phonetic_index', 'segmenter'])
+
+
+def _resolve(path):
+    return path if os.path.isabs(path) else os.path.join(ROOT, path)
+
+
+def parse_mapping(data):
+    """把 JSON 里的指令映射转成编译器用的写法: 同时按键的列表转成元组"""
+    if not isinstance(data, dict):
+        raise CommandCompileError("指令库顶层必须是 {指令名: 步骤列表}")
+    mapping = {}
+    for name, steps in data.items():
+        if not isinstance(steps, list):
+            raise CommandCompileError(f"指令 {name} 的步骤必须是列表")
+        mapping[name] = [tuple(step) if isinstance(step, list) else step for step in steps]
+    return mapping
+
+
+def build_library(mapping, digest=None):
+    """编译指令映射并构建拼音索引和切分器，映射有误时抛出 CommandCompileError"""
+    compiled = compile_commands(mapping)
+    phonetic_index = None
+    if FUZZY_CONFIG['ENABLED']:
+        phonetic_index = PhoneticIndex(mapping.keys(), FUZZY_CONFIG['MAX_DISTANCE'], FUZZY_CONFIG['MAX_RATIO'])
+    return CommandLibrary(digest, mapping, compiled, phonetic_index, CommandSegmenter(mapping))
+
+
+def load_library(path=None, cache_dir=None):
+    """读取指令库文件，按内容哈希优先使用磁盘上的编译缓存
+
+    文件格式或指令有误时抛出 CommandCompileError，读不到文件时抛出 OSError。
+    """
+    path = _resolve(path or COMMAND_LIBRARY_CONFIG['PATH'])
+    cache_dir = _resolve(cache_dir or COMMAND_LIBRARY_CONFIG['CACHE_DIR'])
+    with open(path, 'rb') as f:
+        raw = f.read()
+    # 模糊索引的参数也会影响编译结果，一并计入哈希
+    key = repr((CACHE_VERSION, sorted(FUZZY_CONFIG.items()))).encode('utf-8')
+    digest = hashlib.sha256(key + raw).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{digest}.pickle")
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # 缓存只是加速，读不出来（损坏、类定义或模块改了但忘记加 CACHE_VERSION）就重新编译
+        print(f"指令库缓存无效，重新编译: {type(e).__name__}: {e}")
+
+    try:
+        data = json.loads(raw.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise CommandCompileError(f"指令库 {path} 解析失败: {e}") from None
+    library = build_library(parse_mapping(data), digest)
+
+    # 先写临时文件再改名，两个进程同时编译也不会读到写了一半的缓存
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(library, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"指令库缓存写入失败: {e}")
+    return library
+
+
+class CommandLibraryWatcher:
+    """在后台线程里轮询指令库文件，内容变化并编译通过后调用 on_change(library)
+
+    编译失败时打印错误并继续使用旧版本；on_change 在监视线程里被调用，
+    使用方应只保存新指令库，在自己的循环里合适的时机再切换。
+    """
+
+    def __init__(self, on_change, stop_event, path=None, interval=None, digest=None):
+        self.on_change = on_change
+        self.stop_event = stop_event
+        self.path = _resolve(path or COMMAND_LIBRARY_CONFIG['PATH'])
+        self.interval = interval or COMMAND_LIBRARY_CONFIG['POLL_S']
+        self.digest = digest
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def run(self):
+        last = self.stat()
+        while not self.stop_event.wait(self.interval):
+            current = self.stat()
+            if current is None or current == last:
+                continue
+            last = current
+            try:
+                library = load_library(self.path)
+            except (CommandCompileError, OSError) as e:
+                print(f"指令库有误，继续使用旧版本: {e}")
+                continue
+            if library.digest != self.digest:
+                self.digest = library.digest
+                self.on_change(library)
@@ -0,0 +1,135 @@
+import time
+
+
+def normalize_text(text):
+    """统一识别文本和指令名的写法: 去空格、去 BPE 连接符、英文转小写"""
+    return text.replace("@@", "").replace(" ", "").lower()
+
+
+class _TrieNode:
+    __slots__ = ('children', 'command', 'count', 'only')
+
+    def __init__(self):
+        self.children = {}
+        self.command = None  # 以该节点结尾的指令
+        self.count = 0  # 子树中的指令个数
+        self.only = None  # 子树中只有一个指令时记录它
+
+
+class PrefixCommandMatcher:
+    """基于字符前缀树的增量指令匹配器
+
+    不断送入同一句话逐渐变长的识别结果，一旦前缀只剩一个候选就立即提交；
+    如果当前文本恰好是一个指令、但它还是别的指令的前缀（如 中拳 / 中拳重拳），
+    则等待 extension_timeout_ms，没有后续字符再提交。
+    """
+
+    def __init__(self, commands, extension_timeout_ms=150, min_commit_chars=1):
+        self.extension_timeout = extension_timeout_ms / 1000.0
+        self.min_commit_chars = min_commit_chars
+        self.root = _TrieNode()
+        for command in commands:
+            self._insert(command)
+        self.reset()
+
+    def _insert(self, command):
+        """插入一条指令，沿途更新候选计数"""
+        key = normalize_text(command)
+        path = [self.root]
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+            path.append(node)
+        if node.command is not None:
+            print(f"指令 {command} 与 {node.command} 归一化后重名，已忽略")
+            return
+        node.command = command
+        for n in path:
+            n.count += 1
+            n.only = command if n.count == 1 else None
+
+    def reset(self):
+        """开始新的一句话"""
+        self.text = ''
+        self.pos = 0  # 下一个待匹配指令在文本中的起点
+        self.pending = None  # (指令, 结束位置, 提交截止时间)
+
+    def feed(self, hypothesis, now=None):
+        """送入当前完整的部分识别结果，返回本次确定的指令列表"""
+        if now is None:
+            now = time.monotonic()
+        self.text = normalize_text(hypothesis)
+        committed = []
+        while self.pos < len(self.text):
+            node = self.root
+            i = self.pos
+            last = None  # 沿途最后一个完整指令 (指令, 结束位置)
+            while i < len(self.text) and self.text[i] in node.children:
+                node = node.children[self.text[i]]
+                i += 1
+                if node.command is not None:
+                    last = (node.command, i)
+
+            if i == len(self.text):
+                # 文本已走完，仍在树上
+                if node.only is not None and i - self.pos >= self.min_commit_chars:
+                    committed.append(self._commit(node.only, self.pos + len(normalize_text(node.only))))
+                    continue
+                if node.command is not None:
+                    if self.pending is None or self.pending[0] != node.command:
+                        self.pending = (node.command, i, now + self.extension_timeout)
+                else:
+                    self.pending = None
+                break
+
+            # 在 i 处偏离前缀树
+            if last is not None:
+                committed.append(self._commit(*last))
+            else:
+                # 开头不是任何指令（如语气词），跳过一个字继续
+                self.pending = None
+                self.pos += 1
+        return committed
+
+    def candidates(self):
+        """尚未提交的文本可能对应的全部指令；没有待定文本或已不在前缀树上时返回空集"""
+        node = self.root
+        for ch in self.text[self.pos:]:
+            node = node.children.get(ch)
+            if node is None:
+                return set()
+        if node is self.root:
+            return set()
+        found = set()
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.command is not None:
+                found.add(n.command)
+            stack.extend(n.children.values())
+        return found
+
+    def poll(self, now=None):
+        """检查等待扩展的指令是否超时，超时则提交"""
+        if self.pending is None:
+            return []
+        if now is None:
+            now = time.monotonic()
+        command, end, deadline = self.pending
+        if now < deadline:
+            return []
+        return [self._commit(command, end)]
+
+    def finish(self):
+        """一句话结束，立即提交正在等待的指令并重置"""
+        committed = []
+        if self.pending is not None:
+            command, end, _ = self.pending
+            committed.append(self._commit(command, end))
+        self.reset()
+        return committed
+
+    def _commit(self, command, end):
+        self.pending = None
+        self.pos = end
+        return command
@@ -0,0 +1,10 @@
+from collections import namedtuple
+
+# 识别进程送往执行线程的指令: 指令名、所属语音的 trace id（没有时为 None）、
+# 采集时刻（time.monotonic，非流式为断句时刻），执行端据此判断指令是否已过期；
+# offset 为一句话里说出多条指令时，该指令相对本句第一条指令的说话间隔（秒），执行端按它保持相对节奏，
+# 单条指令或没有时间戳时为 None
+CommandRequest = namedtuple('CommandRequest', ['name', 'trace_id', 'captured', 'offset'], defaults=[None])
+
+# 部分识别结果给出的候选指令集合，执行端先输入它们共同的前缀，等最终指令到达后再走对应分支
+SpeculationRequest = namedtuple('SpeculationRequest', ['candidates', 'trace_id', 'captured'])
@@ -0,0 +1,100 @@
+import time
+import threading
+from collections import deque
+
+from command_request import SpeculationRequest
+from metrics import NULL_METRICS
+
+
+class DeadlineCommandQueue:
+    """执行线程本地的指令队列，按截止时间丢弃过期指令
+
+    - 过期(TTL): 从采集时刻算起超过 TTL 的指令在出队时丢弃并计数，格斗游戏里迟到的输入比没有更糟
+    - 优先指令: 排在所有普通指令前面，并设置 preempt 让正在执行的时间轴在下一帧打断；
+      在它之前排队的普通指令视为被取消
+    - 同一句话里连说的多条指令(trace id 相同)是有意安排的顺序，排在后面的优先指令
+      按普通指令排队，不打断也不取消同一句里前面的指令
+    - 普通指令超过 maxsize 时丢弃最早的一条
+    - 推测请求(SpeculationRequest)只保留最新的一条，排在所有指令之后；
+      任何正式指令到达后，之前的推测请求作废
+    """
+
+    def __init__(self, ttl_ms, priority_commands=(), command_ttl_ms=None, maxsize=10, metrics=None):
+        self.ttl = ttl_ms / 1000
+        self.command_ttl = {name: ms / 1000 for name, ms in (command_ttl_ms or {}).items()}
+        self.priority_commands = set(priority_commands)
+        self.maxsize = maxsize
+        self.urgent = deque()
+        self.normal = deque()
+        self.speculative = None
+        self.last_trace_id = None  # 上一条正式指令所属语音的 trace id
+        self.condition = threading.Condition()
+        # 有优先指令到达，正在执行的时间轴应尽快停下
+        self.preempt = threading.Event()
+        self.expired = 0
+        self.cancelled = 0
+        self.overflow = 0
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+    def ttl_of(self, name):
+        return self.command_ttl.get(name, self.ttl)
+
+    def put(self, request):
+        with self.condition:
+            if isinstance(request, SpeculationRequest):
+                self.speculative = request
+                self.condition.notify()
+                return
+            self.speculative = None
+            same_utterance = request.trace_id is not None and request.trace_id == self.last_trace_id
+            self.last_trace_id = request.trace_id
+            if request.name in self.priority_commands and not same_utterance:
+                if self.normal:
+                    self.cancelled += len(self.normal)
+                    self.metrics.inc('voice_commands_cancelled_total', len(self.normal))
+                    print(f"优先指令 {request.name} 取消了 {len(self.normal)} 条排队中的指令")
+                    self.normal.clear()
+                self.urgent.append(request)
+                self.preempt.set()
+            else:
+                if len(self.normal) >= self.maxsize:
+                    self.normal.popleft()
+                    self.overflow += 1
+                self.normal.append(request)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """取出下一条未过期的指令，超时返回 None；取出时清除 preempt，之后到达的优先指令才会打断它"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                request = self._pop_valid()
+                if request is not None:
+                    self.preempt.clear()
+                    return request
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def _pop_valid(self):
+        now = time.monotonic()
+        for queue in (self.urgent, self.normal):
+            while queue:
+                request = queue.popleft()
+                age = now - request.captured
+                if age > self.ttl_of(request.name):
+                    self.expired += 1
+                    self.metrics.inc('voice_commands_expired_total')
+                    print(f"指令已过期丢弃: {request.name} 距采集 {age * 1000:.0f}ms")
+                    continue
+                return request
+        if self.speculative is not None:
+            request, self.speculative = self.speculative, None
+            if now - request.captured <= self.ttl:
+                return request
+        return None
+
+    def __len__(self):
+        with self.condition:
+            return len(self.urgent) + len(self.normal)
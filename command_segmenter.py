@@ -0,0 +1,78 @@
+from collections import namedtuple
+
+from command_matcher import normalize_text
+
+# 转写中的一段: 命中的指令名（没有命中时为 None）、对应的原文、按字时间戳推出的起止毫秒（没有时间戳时为 None）
+CommandSpan = namedtuple('CommandSpan', ['command', 'text', 'start_ms', 'end_ms'])
+
+
+def align_timestamps(text, timestamps):
+    """把按 token 给出的时间戳展开到去空格后的每个字上
+
+    FunASR 的 text 是空格分隔的 token（中文一个字一个 token，英文一个词一个 token），
+    timestamp 与 token 一一对应；数量对不上时返回 None，按没有时间戳处理。
+    """
+    tokens = [normalize_text(token) for token in text.split()]
+    tokens = [token for token in tokens if token]
+    if not timestamps or len(tokens) != len(timestamps):
+        return None
+    times = []
+    for token, (start, end) in zip(tokens, timestamps):
+        times.extend([(start, end)] * len(token))
+    return times
+
+
+class CommandSegmenter:
+    """把一句话的转写切成指令序列
+
+    一口气说出的 下中拳 取消 重拳 会被识别成一整句，整句并不等于任何一个指令名。
+    这里在指令词表上做动态规划：先让没被任何指令覆盖的字最少，再让指令条数最少，
+    后者等价于最长匹配优先（中拳重拳 不会被拆成 中拳 + 重拳）。
+    没被覆盖的连续文字也作为一段返回，由调用方按读音兜底。
+    """
+
+    def __init__(self, commands):
+        self.commands = {}
+        for command in commands:
+            key = normalize_text(command)
+            if key:
+                self.commands.setdefault(key, command)
+        self.max_len = max((len(key) for key in self.commands), default=0)
+
+    def segment(self, text, timestamps=None):
+        """返回按说话顺序排列的 CommandSpan 列表"""
+        chars = normalize_text(text)
+        times = align_timestamps(text, timestamps)
+        n = len(chars)
+        # best[i]: 前 i 个字的最优切分代价 (未覆盖字数, 指令条数) 以及回溯信息 (上一个位置, 指令)
+        best = [None] * (n + 1)
+        best[0] = ((0, 0), None, None)
+        for i in range(n):
+            if best[i] is None:
+                continue
+            (skipped, count), _, _ = best[i]
+            candidates = [(i + 1, (skipped + 1, count), None)]
+            for j in range(i + 1, min(n, i + self.max_len) + 1):
+                command = self.commands.get(chars[i:j])
+                if command is not None:
+                    candidates.append((j, (skipped, count + 1), command))
+            for j, cost, command in candidates:
+                if best[j] is None or cost < best[j][0]:
+                    best[j] = (cost, i, command)
+
+        pieces = []
+        j = n
+        while j > 0:
+            _, i, command = best[j]
+            if command is None and pieces and pieces[-1][2] is None:
+                # 相邻的未覆盖字合成一段
+                j = pieces.pop()[1]
+            pieces.append((i, j, command))
+            j = i
+        pieces.reverse()
+
+        spans = []
+        for i, j, command in pieces:
+            start_ms, end_ms = (times[i][0], times[j - 1][1]) if times is not None else (None, None)
+            spans.append(CommandSpan(command, chars[i:j], start_ms, end_ms))
+        return spans
@@ -8,6 +8,65 @@ AUDIO_CONFIG = {
     'CHUNK': int(16000 * 0.01),  # 小块数据降低延迟
     'VAD_AGGRESSIVENESS': 3,  # VAD激进程度 (0-3)
     'INPUT_DEVICE_INDEX': None,  # 设为None自动选择，或指定具体索引
+    'PRE_ROLL_MS': 100,  # 语音起点向前多保留的时长，避免字头被切掉
+    'HANGOVER_MS': 150,  # 连续静音超过该时长才认为一句话结束
+    'MAX_SEGMENT_MS': 3000,  # 单段最长时长，超过强制断句
+    'MIN_SPEECH_MS': 60,  # 有效语音短于该时长的段直接丢弃
+    'ENERGY_THRESHOLD': 200,  # 能量门限(16bit RMS)，低于此值不调用VAD，设为0关闭
+    'RING_BUFFER_SECONDS': 30,  # 采集环形缓冲区能容纳的音频时长
+    'STREAMING_END_SILENCE_FRAMES': 30,  # 流式模式下连续静音多少块(10ms)认为一句话结束
+}
+
+# 采集到识别进程的音频传输
+TRANSPORT_CONFIG = {
+    'SHARED_MEMORY': True,  # 音频段经共享内存传递，False 时退回 pickle + mp.Queue
+    'RING_SECONDS': 30,  # 共享内存音频区能容纳的时长
+    'MAX_SEGMENTS': 100,  # 最多排队的语音段数
+}
+
+# 语音识别推理后端
+ASR_CONFIG = {
+    'BACKEND': 'torch',  # torch: funasr AutoModel；onnx: ONNX Runtime（纯CPU机器推荐）
+    'TORCH_MODEL': 'paraformer-zh',  # 即 SeACo-Paraformer，支持热词偏置
+    'ONNX_MODEL_DIR': 'iic/speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-pytorch',  # 本地导出目录或模型名
+    'ONNX_QUANTIZE': True,  # 使用 int8 量化模型
+    'ONNX_THREADS': 4,  # ONNX Runtime 算子内线程数
+}
+
+# 热词偏置（SeACo-Paraformer），指令名作为热词，指令库变化时才重新处理
+HOTWORD_CONFIG = {
+    'ENABLED': True,
+    'CACHE': True,  # 缓存热词切分结果和偏置编码，不再每次推理重算
+    'DEFAULT_WEIGHT': 1,
+    # 单独指定权重，如 {'升龙': 2, '投他': 0}；SeACo 没有逐词权重，这里用重复次数近似：
+    # 0 不作为热词，大于 1 时在热词表里重复出现，偏置注意力分到的比重更大
+    'WEIGHTS': {},
+    'SKIP_ASCII': True,  # 含英文字母的指令名整词会被切成 <unk>，不作为热词，只会干扰偏置
+}
+
+# 识别进程参数
+RECOGNITION_CONFIG = {
+    'BATCH_MAX_SEGMENTS': 4,  # 积压时一次最多合并解码的语音段数
+    'BATCH_MAX_SECONDS': 8.0,  # 一批音频的最长总时长
+    'STALE_AFTER_S': 1.5,  # 断句后超过该时长还没开始识别的语音段直接丢弃
+    'WARMUP_FILES': 'recordings/*_t.wav',  # 启动时用于预热模型的录音（相对项目目录）
+    'WARMUP_COUNT': 2,  # 预热使用的录音条数，0 表示不预热
+    'READY_TIMEOUT_S': 300,  # 等待识别进程就绪的最长时间
+}
+
+# 关键词检测第一级，只认指令短语，有把握时跳过 paraformer
+KWS_CONFIG = {
+    'ENABLED': False,
+    'MODEL': 'iic/speech_charctc_kws_phone-xiaoyun',  # 也可指向本地训练的模型目录
+    'THRESHOLD': 0.25,  # 检测分数达到该值才直接出指令，参考 outputs/debug/detect 中命中的分数
+    'KEYWORDS': None,  # None 表示使用全部纯中文指令名
+}
+
+# 流式识别参数
+STREAMING_CONFIG = {
+    'CHUNK_SIZE': [0, 4, 4],  # [0, 10, 5] 600ms, [0, 8, 4] 480ms, [0, 4, 4] 240ms
+    'ENCODER_CHUNK_LOOK_BACK': 4,  # 编码器自注意力回看的chunk数
+    'DECODER_CHUNK_LOOK_BACK': 1,  # 解码器交叉注意力回看的编码器chunk数
 }
 
 # 人物位置配置
@@ -15,30 +74,126 @@ PLAYER_CONFIG = {
     'LOCATION': 'left',  # 枚举：left right 默认人物在左边
 }
 
-# 语音指令映射
-COMMAND_MAPPING = {
-    "转向": ["@"],
-    "发波": ["s", ("s", "d"), "d", "o"],
-    "升龙": ["d", ("s", "d"), "s", ("s", "d"), "d", "i"],
-    "迸发": ["y"],
-    "下中脚": [("s", "k")],
-    "下中脚取消": [("s", "k"), "", "", "h"],
-    "下中拳": [("s", "i")],
-    "取消": ["h"],
-    "重拳": ["o"],
-    "中拳": ["i"],
-    "中拳重拳": ["i", "", "", "", "", "o"],
-    "tc": ["i", "#4", "o"],
-    "跑旋风腿": [("j", "k"), "#6", 's', ("s", "a"), ('a', 'j'), 'j'],
-    "TC跑旋风腿": ["$tc", "#34","$跑旋风腿"],
-    "跳重脚": ['w', "#29", 'l'],
-    "绿冲": ['h', ("h", "d"), "h", ("h", "d")],
-    "跑升龙": [("j", "k"), 'd', ("d", "s"), ('d', 'i'), 'i'],
-    "一个z": ['s', ("s", "d"), 'd', 's', ("s", "d"), 'd', 'i'],
-    "机库金莱": ['s', ("s", "d"), 'd', 's', ("s", "d"), 'd', 'k'],
-    "SAE": ['s', ("s", "a"), 'a', 's', ("s", "a"), 'a', 'k'],
-    "多达": ['d', ("d", "s"), 's', ("s", "d"), 'd', 'l'],
-    "投他": [("j", "u")],
-    "咿呀": ['s', ("s", "d"), 'd', 'k', '#5', 'j'],
-    "下中脚复合": ['$下中脚取消', "#17", '$下中拳', "#47", "$TC跑旋风腿"],
-}
\ No newline at end of file
+# 流式指令匹配参数
+MATCHER_CONFIG = {
+    'EXTENSION_TIMEOUT_MS': 150,  # 当前文本已是完整指令但还可能变长时(中拳/中拳重拳)，最多等待的时间
+    'MIN_COMMIT_CHARS': 1,  # 前缀唯一时至少听到几个字才提交
+}
+
+# 一句话里连说多条指令(下中拳 取消 重拳)时的切分，仅非流式识别
+SEGMENTER_CONFIG = {
+    'ENABLED': True,
+    'KEEP_TIMING': True,  # 按字时间戳保持各指令说出时的相对间隔，没有时间戳(ONNX 后端)时依次执行
+    'MAX_GAP_MS': 800,  # 两条指令之间最多等待的时长，停顿更久也按这个间隔执行
+}
+
+# 拼音模糊匹配参数，识别结果不能精确命中时按读音找最近的指令
+FUZZY_CONFIG = {
+    'ENABLED': True,
+    'MAX_DISTANCE': 1,  # 允许的最大音节编辑距离
+    'MAX_RATIO': 0.5,  # 编辑距离占指令音节数的最大比例，超过视为误识别；0.5 时两个音节的指令可错一个音节，单音节指令不做模糊匹配
+}
+
+# 指令执行配置
+EXECUTOR_CONFIG = {
+    'FPS': 60,  # 游戏帧率，"#N" 放帧和每个按键的按住时长都以此为准
+    'SPIN_MS': 2.0,  # 距离截止时间小于该值时改为自旋等待，Windows 下 sleep 精度差可适当调大
+    'REPORT_TIMING': True,  # 每个指令执行完后打印按键触发的延迟统计
+    # 按键输出后端: keyboard（跨平台）、uinput（Linux 虚拟键盘，同一帧的按键一次写入）、recording（只记录）
+    'OUTPUT': 'keyboard',
+    'UINPUT_NAME': 'voice-sf6-keyboard',
+    'KEY_CODES': None,  # uinput 下按键名 -> evdev 键码的补充映射，如 {'right shift': 54}（KEY_RIGHTSHIFT）
+    'RECORDING_MAX_BATCHES': 10000,  # recording 后端最多保留的按键帧数，长时间运行时旧的记录被丢掉
+}
+
+# 执行端指令队列: 过期丢弃和优先指令打断
+COMMAND_QUEUE_CONFIG = {
+    'TTL_MS': 600,  # 从采集（断句）到开始执行超过该时长的指令直接丢弃
+    'COMMAND_TTL_MS': {},  # 单独指定某些指令的 TTL，如 {'升龙': 400}
+    'PRIORITY_COMMANDS': ['取消', '绿冲'],  # 插队并在下一帧打断正在执行的连招，松开所有按住的键
+    'MAX_PENDING': 10,
+}
+
+# 推测执行（仅流式识别）: 部分结果还对应多条候选指令时，先输入它们时间轴上相同的前几帧，
+# 最终指令到达后从分叉处接着执行；落空或超时则松开所有键
+SPECULATION_CONFIG = {
+    'ENABLED': True,
+    'MAX_HOLD_MS': 120,  # 前缀输入完后最多等待最终指令的时长
+    'MIN_PREFIX_FRAMES': 1,  # 共同前缀至少覆盖几帧才值得推测，按帧号计，"#N" 放帧也算在内
+}
+
+# CPU 布局: 各阶段绑定的核心、优先级(nice，越小越优先，负值需要管理员权限)和 torch 线程数
+# 执行线程的绑核和优先级是线程级的，仅 Linux 支持
+CPU_CONFIG = {
+    'ENABLED': False,
+    'AUDIO': {'CPUS': [0], 'NICE': -5},
+    'RECOGNITION': {'CPUS': [2, 3], 'NICE': 5, 'TORCH_THREADS': 2, 'TORCH_INTEROP_THREADS': 1},
+    'EXECUTOR': {'CPUS': [1], 'NICE': -10},
+}
+
+# 延迟追踪配置：记录每条语音从起点到按键释放的各阶段时间
+TRACE_CONFIG = {
+    'ENABLED': False,
+    'PATH': 'outputs/trace.json',
+    'FORMAT': 'chrome',  # chrome: chrome://tracing / Perfetto 可直接打开；jsonl: 每行一条打点
+}
+
+# 运行指标: 各进程把计数和直方图写进共享内存，主进程在 http://HOST:PORT/metrics 以 Prometheus 格式提供，
+# 终端看板: python metrics.py
+METRICS_CONFIG = {
+    'ENABLED': False,
+    'HOST': '127.0.0.1',
+    'PORT': 9464,
+}
+
+# 主管: 主进程监视采集和识别进程，故障时切换到热备识别进程或重启采集，执行线程不受影响
+SUPERVISOR_CONFIG = {
+    'ENABLED': False,  # 目前只接入 main_no_streaming.py
+    'STANDBY': False,  # 预先加载并预热一个热备识别进程，故障时毫秒级接管；多占一份模型内存，启动和切换后会与工作中的识别进程争抢 CPU
+    'CHECK_INTERVAL_S': 0.1,
+    'HEARTBEAT_TIMEOUT_S': 2.0,  # 识别进程空闲时超过该时长没有心跳视为卡死
+    'INFERENCE_TIMEOUT_S': 5.0,  # 单次推理超过该时长视为卡死
+    'CAPTURE_TIMEOUT_S': 1.0,  # 音频回调停止超过该时长重启采集进程
+    'RESTART_BACKOFF_S': 1.0,  # 重启前等待，避免反复崩溃时空转
+}
+
+# 调试语料: 识别进程在后台把每个语音段的音频、识别文本、指令和耗时追加写进容器文件，作为调参的回放语料
+# 读取见 debug_store.DebugStoreReader
+DEBUG_STORE_CONFIG = {
+    'ENABLED': False,
+    'DIR': 'outputs/debug_store',
+    'MAX_BYTES': 256 * 1024 * 1024,  # 单个容器文件超过该大小后换新文件
+    'COMPRESS': True,  # 音频用 zlib 压缩
+    'MAX_PENDING': 256,  # 后台来不及写时最多排队的段数，超过直接丢弃
+}
+
+# 指令库: 指令映射放在外部 JSON 文件里，修改后运行中自动重新加载，无需重启
+# 写法: 字符串为单个按键（按住一帧），列表为同时按键，"" 空等一帧，"#N" 放 N 帧，"$名称" 嵌套指令，"@" 转向
+COMMAND_LIBRARY_CONFIG = {
+    'PATH': 'commands.json',
+    'CACHE_DIR': 'outputs/cache/commands',  # 编译结果按文件内容哈希缓存
+    'WATCH': True,
+    'POLL_S': 0.5,  # 检查文件是否变化的间隔
+}
+
+# 多路识别服务（main_server.py）: 一份模型服务多个采集端，每路有自己的麦克风、指令库、人物位置和按键输出
+SERVER_CONFIG = {
+    'SESSIONS': [
+        {'NAME': 'p1', 'INPUT_DEVICE_INDEX': None, 'COMMANDS': 'commands.json', 'LOCATION': 'left',
+         'OUTPUT': 'keyboard'},
+        # 再加一路时按设备号填写，如解说麦克风只识别不按键:
+        # {'NAME': 'caster', 'INPUT_DEVICE_INDEX': 1, 'COMMANDS': 'commands.json', 'LOCATION': 'left',
+        #  'OUTPUT': 'recording'},
+    ],
+    'IDLE_POLL_MS': 2,  # 所有会话都没有语音时的轮询间隔
+}
+
+# 本地录音的标注，文件名（去掉 _t 后缀）-> 指令，用于后端对比和基准测试的准确率统计
+RECORDING_LABELS = {
+    '2mk': '下中脚',
+    '2mp': '下中拳',
+    'mp': '中拳',
+    'hp': '重拳',
+    'h': '取消',
+    'fabo': '发波',
+}
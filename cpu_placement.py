@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import threading
+from queue import Empty
+
+from config import CPU_CONFIG
+
+
+def _set_affinity(cpus, thread):
+    """绑定 CPU；Linux 下可精确到线程，其他平台只能作用于整个进程"""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(threading.get_native_id() if thread else 0, cpus)
+        return sorted(os.sched_getaffinity(threading.get_native_id() if thread else 0))
+    if thread:
+        raise OSError("当前平台不支持线程级绑核")
+    import psutil
+    process = psutil.Process()
+    process.cpu_affinity(list(cpus))
+    return sorted(process.cpu_affinity())
+
+
+def _set_priority(nice, thread):
+    """调整优先级，nice 越小越优先；负值通常需要管理员/root 权限"""
+    if sys.platform != 'win32':
+        # Linux 下 setpriority 以线程 id 作用于单个线程
+        who = threading.get_native_id() if thread else 0
+        os.setpriority(os.PRIO_PROCESS, who, nice)
+        return os.getpriority(os.PRIO_PROCESS, who)
+    if thread:
+        raise OSError("当前平台不支持线程级优先级")
+    import psutil
+    process = psutil.Process()
+    if nice < 0:
+        process.nice(psutil.HIGH_PRIORITY_CLASS)
+    elif nice > 0:
+        process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+    return process.nice()
+
+
+def _set_torch_threads(intra, inter):
+    """限制 torch 算子内/算子间线程数，需在模型加载和首次推理前调用"""
+    if intra:
+        os.environ['OMP_NUM_THREADS'] = str(intra)
+    import torch
+    if intra:
+        torch.set_num_threads(intra)
+    if inter:
+        torch.set_num_interop_threads(inter)
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def _try(setter, *args):
+    try:
+        return setter(*args)
+    except (OSError, ImportError, RuntimeError) as e:
+        # 权限不足或平台不支持时保持默认，报告里注明
+        return f"未生效: {e}"
+
+
+def apply_placement(stage, thread=False, report_queue=None):
+    """按 CPU_CONFIG 为当前进程（thread=True 时为当前线程）设置绑核、优先级和 torch 线程数
+
+    返回实际生效的布局，并放入 report_queue 供主进程汇总打印。
+    """
+    if not CPU_CONFIG['ENABLED']:
+        return None
+    conf = CPU_CONFIG[stage]
+    applied = {'stage': stage, 'pid': os.getpid(), 'tid': threading.get_native_id() if thread else None}
+    if conf.get('CPUS'):
+        applied['cpus'] = _try(_set_affinity, conf['CPUS'], thread)
+    if conf.get('NICE'):
+        applied['nice'] = _try(_set_priority, conf['NICE'], thread)
+    if conf.get('TORCH_THREADS') or conf.get('TORCH_INTEROP_THREADS'):
+        applied['torch'] = _try(_set_torch_threads, conf.get('TORCH_THREADS'), conf.get('TORCH_INTEROP_THREADS'))
+    if report_queue is not None:
+        report_queue.put(applied)
+    return applied
+
+
+def collect_placement(placement_queue, count, timeout=2.0):
+    """收集各阶段回报的 CPU 布局，超时未回报的阶段略过"""
+    reports = []
+    deadline = time.time() + timeout
+    while len(reports) < count:
+        try:
+            reports.append(placement_queue.get(timeout=max(0.01, deadline - time.time())))
+        except Empty:
+            break
+    return reports
+
+
+def print_placement_report(reports):
+    """打印各阶段实际生效的 CPU 布局"""
+    print("CPU 布局:")
+    for report in reports:
+        where = f"pid={report['pid']}" + (f" tid={report['tid']}" if report['tid'] else "")
+        parts = [f"{key}={report[key]}" for key in ('cpus', 'nice', 'torch') if key in report]
+        print(f"  {report['stage']:<12}{where:<24}{' '.join(parts) or '默认'}")
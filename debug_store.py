@@ -0,0 +1,197 @@
+import os
+import glob
+import json
+import time
+import zlib
+import random
+import struct
+import threading
+from queue import Queue, Empty, Full
+from collections import namedtuple
+
+import numpy as np
+
+# 调试语料存储: 每个语音段的音频、识别文本、匹配到的指令和各阶段耗时追加写进一个容器文件，
+# 旁边的 .idx 记录每条记录的位置，读取时可以顺序遍历，也可以随机抽样，作为调参用的回放语料。
+#
+# 容器文件(.rec)由若干条记录首尾相接组成，每条记录:
+#   头部 RECORD_HEADER: 魔数、标志位、元数据长度、音频长度
+#   元数据: UTF-8 JSON
+#   音频: 16kHz 16bit 单声道 PCM，标志位 FLAG_ZLIB 时为 zlib 压缩后的数据
+# 索引文件(.idx)每条记录一个 INDEX_ENTRY: 记录在容器文件里的起始偏移和总长度。
+# 先写记录再写索引，进程中途退出时最多丢掉最后一条没写进索引的记录。
+
+MAGIC = b'SEG1'
+RECORD_HEADER = struct.Struct('<4sBII')
+INDEX_ENTRY = struct.Struct('<QI')
+FLAG_ZLIB = 1
+SAMPLE_RATE = 16000
+
+# 读出的一条记录: 元数据字典、16bit PCM 字节
+DebugRecord = namedtuple('DebugRecord', ['meta', 'pcm'])
+
+
+def _to_pcm16(samples):
+    """模型输入的 float32 数组转回 16bit PCM，已经是字节的原样返回"""
+    if isinstance(samples, (bytes, bytearray, memoryview)):
+        return bytes(samples)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+class DebugRecorder:
+    """后台线程写调试语料，record 只把对象放进内存队列，不做任何转换和 IO
+
+    队列满时丢弃并计数，绝不让识别进程等待磁盘；容器文件超过 max_bytes 后换新文件。
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, compress=True, max_pending=256):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.queue = Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+        self.data_file = None
+        self.index_file = None
+        self.file_bytes = 0
+        self.files = 0
+        self.thread = None
+        self.closed = threading.Event()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def record(self, pcm, meta):
+        """pcm 为 float32 数组或 16bit PCM 字节，meta 为可 JSON 序列化的字典；调用后不能再修改 pcm"""
+        try:
+            self.queue.put_nowait((pcm, meta))
+        except Full:
+            self.dropped += 1
+
+    def close(self, timeout=2.0):
+        """写完已排队的记录后关闭文件"""
+        self.closed.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        print(f"调试语料: 写入 {self.written} 条，丢弃 {self.dropped} 条")
+
+    def run(self):
+        try:
+            while not self.closed.is_set() or not self.queue.empty():
+                try:
+                    pcm, meta = self.queue.get(timeout=0.1)
+                except Empty:
+                    continue
+                try:
+                    self.write(_to_pcm16(pcm), meta)
+                except (OSError, TypeError, ValueError) as e:
+                    print(f"调试语料写入失败: {e}")
+        finally:
+            self.close_files()
+
+    def write(self, pcm, meta):
+        flags = 0
+        if self.compress:
+            pcm = zlib.compress(pcm, 1)
+            flags |= FLAG_ZLIB
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        record = RECORD_HEADER.pack(MAGIC, flags, len(meta_bytes), len(pcm)) + meta_bytes + pcm
+        if self.data_file is None or (self.file_bytes and self.file_bytes + len(record) > self.max_bytes):
+            self.rotate()
+        offset = self.file_bytes
+        self.data_file.write(record)
+        self.data_file.flush()
+        self.index_file.write(INDEX_ENTRY.pack(offset, len(record)))
+        self.index_file.flush()
+        self.file_bytes += len(record)
+        self.written += 1
+
+    def rotate(self):
+        """关闭当前文件，按时间和序号开一个新的容器文件"""
+        self.close_files()
+        self.files += 1
+        name = f"debug-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.files:03d}"
+        path = os.path.join(self.directory, name)
+        self.data_file = open(path + '.rec', 'ab')
+        self.index_file = open(path + '.idx', 'ab')
+        self.file_bytes = self.data_file.tell()
+
+    def close_files(self):
+        for f in (self.data_file, self.index_file):
+            if f is not None:
+                f.close()
+        self.data_file = self.index_file = None
+
+
+class DebugStoreReader:
+    """读取调试语料，path 可以是单个 .rec 文件或存放它们的目录
+
+    用法:
+        reader = DebugStoreReader('outputs/debug_store')
+        for record in reader: ...
+        for record in reader.sample(20): ...
+    """
+
+    def __init__(self, path):
+        if os.path.isdir(path):
+            self.files = sorted(glob.glob(os.path.join(path, '*.rec')))
+        else:
+            self.files = [path]
+        self.entries = []  # (文件, 偏移, 长度)
+        for data_path in self.files:
+            self.entries.extend((data_path, offset, size) for offset, size in self.read_index(data_path))
+
+    @staticmethod
+    def read_index(data_path):
+        """读索引，只保留完整落在容器文件里的记录"""
+        index_path = os.path.splitext(data_path)[0] + '.idx'
+        data_size = os.path.getsize(data_path)
+        with open(index_path, 'rb') as f:
+            raw = f.read()
+        usable = len(raw) - len(raw) % INDEX_ENTRY.size
+        return [(offset, size) for offset, size in INDEX_ENTRY.iter_unpack(raw[:usable])
+                if offset + size <= data_size]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        data_path, offset, size = self.entries[i]
+        with open(data_path, 'rb') as f:
+            f.seek(offset)
+            return self.decode(f.read(size))
+
+    def __iter__(self):
+        current = f = None
+        try:
+            for data_path, offset, size in self.entries:
+                if data_path != current:
+                    if f is not None:
+                        f.close()
+                    f = open(data_path, 'rb')
+                    current = data_path
+                f.seek(offset)
+                yield self.decode(f.read(size))
+        finally:
+            if f is not None:
+                f.close()
+
+    def sample(self, k, seed=None):
+        """不放回地随机抽取 k 条记录"""
+        indices = random.Random(seed).sample(range(len(self.entries)), min(k, len(self.entries)))
+        return [self[i] for i in indices]
+
+    @staticmethod
+    def decode(raw):
+        magic, flags, meta_len, pcm_len = RECORD_HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError("调试语料记录损坏: 魔数不符")
+        start = RECORD_HEADER.size
+        meta = json.loads(raw[start:start + meta_len].decode('utf-8'))
+        pcm = raw[start + meta_len:start + meta_len + pcm_len]
+        if flags & FLAG_ZLIB:
+            pcm = zlib.decompress(pcm)
+        return DebugRecord(meta, pcm)
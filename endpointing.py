@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class VadEndpointer:
+    """采集端的断句状态机
+
+    - 能量门限: 明显静音的块不送 webrtcvad，直接按非语音处理
+    - 预录(pre-roll): 语音起点向前多带一小段，保住被VAD判成静音的字头
+    - 拖尾(hangover): 连续静音超过该时长才断句，避免一句话被切成几段
+    - 最大长度: 超过后强制断句，防止一直有声音时迟迟不出结果
+    - 最短语音: 有效语音太短的段直接丢弃，省掉一次必然匹配不上的推理
+
+    位置均为环形缓冲区的累计字节数，输出 (起点, 终点)。
+    """
+
+    def __init__(self, vad, rate, chunk_bytes, pre_roll_ms=100, hangover_ms=150,
+                 max_segment_ms=3000, min_speech_ms=60, energy_threshold=0):
+        self.vad = vad
+        self.rate = rate
+        bytes_per_ms = rate * 2 // 1000
+        chunk_ms = max(1, chunk_bytes // bytes_per_ms)
+        self.pre_roll_bytes = pre_roll_ms * bytes_per_ms
+        self.hangover_chunks = hangover_ms // chunk_ms
+        self.max_segment_bytes = max_segment_ms * bytes_per_ms
+        self.min_speech_chunks = max(1, min_speech_ms // chunk_ms)
+        # 能量门限按均方值比较，省掉开方
+        self.energy_threshold_sq = energy_threshold * energy_threshold
+        self.reset()
+
+    def reset(self):
+        self.start = None  # 当前语音段起点，None 表示不在语音中
+        self.speech_chunks = 0  # 当前段内的有效语音块数
+        self.silence_chunks = 0  # 当前段末尾连续静音块数
+
+    def is_speech(self, in_data):
+        """先过能量门限，再交给 webrtcvad"""
+        if self.energy_threshold_sq:
+            samples = np.frombuffer(in_data, dtype=np.int16).astype(np.float32)
+            if float(np.dot(samples, samples)) / max(len(samples), 1) < self.energy_threshold_sq:
+                return False
+        return self.vad.is_speech(in_data, self.rate)
+
+    def update(self, in_data, position):
+        """处理刚写入缓冲区、结束于 position 的一块音频，断句时返回 (起点, 终点)"""
+        speech = self.is_speech(in_data)
+
+        if self.start is None:
+            if speech:
+                chunk_start = position - len(in_data)
+                self.start = max(0, chunk_start - self.pre_roll_bytes)
+                self.speech_chunks = 1
+                self.silence_chunks = 0
+            return None
+
+        if speech:
+            self.speech_chunks += 1
+            self.silence_chunks = 0
+        else:
+            self.silence_chunks += 1
+
+        if position - self.start >= self.max_segment_bytes:
+            # 超长强制断句，如果还在说话就从这里接着开始下一段
+            segment = self._close(position)
+            if speech:
+                self.start = position
+                self.speech_chunks = 1
+            return segment
+
+        if self.silence_chunks > self.hangover_chunks:
+            return self._close(position)
+        return None
+
+    def _close(self, position):
+        """结束当前段，语音太短则丢弃"""
+        segment = (self.start, position)
+        enough = self.speech_chunks >= self.min_speech_chunks
+        self.reset()
+        return segment if enough else None
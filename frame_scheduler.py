@@ -0,0 +1,77 @@
+import time
+from collections import namedtuple
+
+# 单次回放的计时结果: 每个事件的目标帧与实际延迟（纳秒）
+EventTiming = namedtuple('EventTiming', ['frame', 'action', 'key', 'late_ns'])
+
+
+class FrameScheduler:
+    """基于绝对截止时间的帧调度器
+
+    所有事件的触发时间都从连招起点按帧号直接算出，不会像连续 sleep 那样累积误差；
+    等待时先粗 sleep，剩下最后一小段用 perf_counter_ns 自旋补齐。
+    """
+
+    def __init__(self, fps=60, spin_ms=2.0):
+        self.fps = fps
+        self.spin_ns = int(spin_ms * 1_000_000)
+
+    def frame_offset_ns(self, frame):
+        """第 frame 帧相对起点的纳秒偏移，整数运算避免舍入漂移"""
+        return frame * 1_000_000_000 // self.fps
+
+    def wait_until(self, deadline_ns):
+        """等待到绝对时间 deadline_ns，返回实际醒来的时间"""
+        now = time.perf_counter_ns()
+        remaining = deadline_ns - now
+        if remaining > self.spin_ns:
+            time.sleep((remaining - self.spin_ns) / 1e9)
+        now = time.perf_counter_ns()
+        while now < deadline_ns:
+            now = time.perf_counter_ns()
+        return now
+
+    def wait_frames(self, start_ns, first, last, interrupted):
+        """逐帧等到第 last 帧，每个帧边界检查一次 interrupted()，被打断返回 False"""
+        for frame in range(first, last + 1):
+            self.wait_until(start_ns + self.frame_offset_ns(frame))
+            if interrupted():
+                return False
+        return True
+
+    def run(self, frames, fire, length=0, start_ns=None, interrupted=None):
+        """按帧回放事件
+
+        frames: 按帧排序的 (帧号, 事件元组)，fire(events) 负责把同一帧的事件一次发出；
+        length: 时间轴总帧数，回放结束后等到该帧为止；
+        interrupted: 可选的无参函数，给出时每个帧边界（包括放帧期间）都检查一次，
+        返回真则立即停止，剩余事件不再触发。
+        返回已触发事件的 EventTiming 列表，同一帧的事件共用一个触发时刻。
+        """
+        if start_ns is None:
+            start_ns = time.perf_counter_ns()
+        timings = []
+        next_frame = 0
+        for frame, events in frames:
+            if interrupted is not None and not self.wait_frames(start_ns, next_frame, frame, interrupted):
+                return timings
+            deadline = start_ns + self.frame_offset_ns(frame)
+            fired_ns = self.wait_until(deadline)
+            fire(events)
+            late_ns = fired_ns - deadline
+            timings.extend(EventTiming(frame, e.action, e.key, late_ns) for e in events)
+            next_frame = frame + 1
+        if length:
+            if interrupted is not None:
+                self.wait_frames(start_ns, next_frame, length, interrupted)
+            else:
+                self.wait_until(start_ns + self.frame_offset_ns(length))
+        return timings
+
+
+def summarize_timings(timings):
+    """汇总延迟: (事件数, 平均毫秒, 最大毫秒)"""
+    if not timings:
+        return 0, 0.0, 0.0
+    lates = [t.late_ns for t in timings]
+    return len(lates), sum(lates) / len(lates) / 1e6, max(lates) / 1e6
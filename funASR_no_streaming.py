@@ -1,35 +1,60 @@
 import time
 import wave
-import os
-from datetime import datetime
-from funasr import AutoModel
 import threading
 import traceback
+from audio_segment import pcm_to_float
+from asr_backends import create_backend
+from config import ASR_CONFIG, HOTWORD_CONFIG
+
+
+def build_hotwords(keywords):
+    """按权重把指令名拼成热词文本，没有可用热词时返回 None"""
+    words = []
+    for keyword in keywords or ():
+        if HOTWORD_CONFIG['SKIP_ASCII'] and any(c.isascii() for c in keyword):
+            continue
+        words.extend([keyword] * int(HOTWORD_CONFIG['WEIGHTS'].get(keyword, HOTWORD_CONFIG['DEFAULT_WEIGHT'])))
+    return " ".join(words) if words else None
+
 
 class FunASR:
-    def __init__(self, output_dir="./outputs/debug", device='cpu', keywords=None):
+    def __init__(self, output_dir="./outputs/debug", device='cpu', keywords=None, backend_config=None):
         # 预加载模型
 
-        self.keywords = " ".join(keywords)
+        self.set_keywords(keywords)
         # self.keywords = keywords
 
         print(self.keywords)
-        print("正在加载语音识别模型...")
+        backend_config = backend_config or ASR_CONFIG
+        print(f"正在加载语音识别模型（{backend_config['BACKEND']}）...")
+        # 推理库在后端内部才导入，避免主进程被拖慢；启动耗时分解单位为秒
+        self.backend = create_backend(backend_config, output_dir=output_dir, device=device)
+        self.timings = dict(self.backend.timings)
+        print(f"模型加载完成，耗时: {self.timings['load']:.2f}秒")
+
+    def set_keywords(self, keywords):
+        """更新热词，指令库重新加载时调用，不影响已加载的模型；热词文本不变时后端缓存继续有效"""
+        self.keywords = build_hotwords(keywords) if HOTWORD_CONFIG['ENABLED'] else None
+
+    def warmup(self, paths):
+        """用本地录音先解码一遍，让首个真实指令不再承担初始化开销"""
         start_time = time.time()
-        self.model = AutoModel(
-            model='paraformer-zh',
-            output_dir=output_dir,
-            device=device
-        )
-        print(f"模型加载完成，耗时: {time.time() - start_time:.2f}秒")
+        samples = []
+        for path in paths:
+            with wave.open(path, 'rb') as wav_file:
+                samples.append(pcm_to_float(wav_file.readframes(-1)))
+        for sample in samples:
+            self.generate(sample)
+        if len(samples) > 1:
+            # 批量路径的形状不同，也预热一次
+            self.generate_batch(samples)
+        self.timings['warmup'] = time.time() - start_time
+        print(f"模型预热完成，{len(samples)}段录音，耗时: {self.timings['warmup']:.2f}秒")
 
     def generate(self, input_data):
-        # if self.enable_debug:
-        #     self._save_to_wav(input_data)
-
         try:
             start_time = time.time()
-            res = self.model.generate(input=input_data, batch_size_s=300, hotword=self.keywords)
+            res = self.backend.generate(input_data, hotword=self.keywords)
             # 在调用模型之后记录结束时间
             end_time = time.time()
             # 计算耗时
@@ -42,22 +67,21 @@ class FunASR:
             # 重置缓存以防错误累积
             return []
 
-    def _save_to_wav(self, audio_data):
-        """将音频数据保存为WAV文件（仅在调试模式下使用）"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        filename = f"audio_{timestamp}.wav"
-        filepath = os.path.join(self.output_dir, filename)
-
+    def generate_batch(self, inputs):
+        """一次解码多段音频，返回与 inputs 顺序一致的结果列表，出错时返回空列表"""
         try:
-            with wave.open(filepath, 'wb') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(16000)  # 注意：这里应该是16000，不是8000
-                wav_file.writeframes(audio_data)
-
-            print(f"音频已保存到: {filepath}")
+            start_time = time.time()
+            res = self.backend.generate_batch(inputs, hotword=self.keywords)
+            elapsed_time = time.time() - start_time
+            print(f"Batch inference of {len(inputs)} segments took {elapsed_time} seconds.")
+            if len(res) != len(inputs):
+                print(f"批量识别结果数量不符: {len(res)}/{len(inputs)}")
+                return []
+            return res
         except Exception as e:
-            print(f"保存音频文件失败: {e}")
+            print(f"语音识别错误: {e}")
+            traceback.print_exc()
+            return []
 
 
 # 使用示例
@@ -0,0 +1,102 @@
+import time
+import wave
+import traceback
+import numpy as np
+
+
+class FunASRStreaming:
+    """paraformer-zh-streaming 的流式封装
+
+    音频以任意长度的小块送入，攒够一个 chunk_stride 就解码一次；
+    cache 在一句话内持续保留，句子结束（is_final）后重置。
+    """
+
+    def __init__(self, output_dir="./outputs/debug", device='cpu', chunk_size=(0, 10, 5),
+                 encoder_chunk_look_back=4, decoder_chunk_look_back=1):
+        self.chunk_size = list(chunk_size)
+        self.encoder_chunk_look_back = encoder_chunk_look_back
+        self.decoder_chunk_look_back = decoder_chunk_look_back
+        # 每个 chunk_size[1] 单位对应 60ms，即 960 个采样点
+        self.chunk_stride = self.chunk_size[1] * 960
+        self.pending = bytearray()
+        self.cache = {}
+
+        # 启动耗时分解，单位秒
+        self.timings = {}
+        print("正在加载流式语音识别模型...")
+        start_time = time.time()
+        from funasr import AutoModel
+        self.timings['import'] = time.time() - start_time
+
+        start_time = time.time()
+        self.model = AutoModel(
+            model='paraformer-zh-streaming',
+            output_dir=output_dir,
+            device=device
+        )
+        self.timings['load'] = time.time() - start_time
+        print(f"流式模型加载完成，耗时: {self.timings['load']:.2f}秒")
+
+    def warmup(self, paths):
+        """用本地录音按10ms小块走一遍流式解码"""
+        start_time = time.time()
+        step = 160 * 2
+        for path in paths:
+            with wave.open(path, 'rb') as wav_file:
+                audio_data = wav_file.readframes(-1)
+            for i in range(0, len(audio_data), step):
+                self.feed(audio_data[i:i + step])
+            self.feed(b'', is_final=True)
+        self.timings['warmup'] = time.time() - start_time
+        print(f"流式模型预热完成，{len(paths)}段录音，耗时: {self.timings['warmup']:.2f}秒")
+
+    def reset(self):
+        """开始新的一句话"""
+        self.pending = bytearray()
+        self.cache = {}
+
+    def feed(self, audio_data, is_final=False):
+        """送入 16bit PCM 数据，返回这次新解码出的文本片段列表"""
+        self.pending += audio_data
+        stride_bytes = self.chunk_stride * 2
+        texts = []
+        while len(self.pending) >= stride_bytes and not (is_final and len(self.pending) == stride_bytes):
+            chunk = bytes(self.pending[:stride_bytes])
+            del self.pending[:stride_bytes]
+            texts.append(self._decode(chunk, False))
+        if is_final:
+            # 最后一块不足一个 stride 时补静音，保证模型能收尾
+            chunk = bytes(self.pending) or b'\x00\x00' * 960
+            texts.append(self._decode(chunk, True))
+            self.reset()
+        return [t for t in texts if t]
+
+    def _decode(self, chunk, is_final):
+        """解码单个 chunk"""
+        speech = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768
+        try:
+            res = self.model.generate(input=speech, cache=self.cache, is_final=is_final,
+                                      chunk_size=self.chunk_size,
+                                      encoder_chunk_look_back=self.encoder_chunk_look_back,
+                                      decoder_chunk_look_back=self.decoder_chunk_look_back)
+        except Exception as e:
+            print(f"流式识别错误: {e}")
+            traceback.print_exc()
+            # 出错后丢弃本句缓存，避免错误状态带到后面的 chunk
+            self.cache = {}
+            return ''
+        if not res:
+            return ''
+        return res[0].get('text', '')
+
+
+# 使用示例
+if __name__ == "__main__":
+    asr_model = FunASRStreaming()
+    path = 'recordings/2mk.wav'
+    audio_data = wave.open(path, 'rb').readframes(-1)
+    step = 160 * 2  # 模拟10ms一块的采集
+    for i in range(0, len(audio_data), step):
+        for text in asr_model.feed(audio_data[i:i + step]):
+            print("部分结果:", text)
+    print("最终结果:", asr_model.feed(b'', is_final=True))
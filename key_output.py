@@ -0,0 +1,155 @@
+import os
+import time
+import struct
+from collections import deque
+
+# 角色在右侧时左右方向互换
+SIDE_SWAP = {'a': 'd', 'd': 'a'}
+LOCATIONS = ('left', 'right')
+
+
+class KeyOutput:
+    """按键输出后端
+
+    启动时为指令里出现的全部按键预先算好两张 按键 -> 后端原生键码 的表（左侧/右侧），
+    执行时只查表；send 收到同一帧的全部 (键码, 是否按下)，由后端尽量一次发出。
+    """
+
+    def __init__(self, keys):
+        self.tables = self.build_tables(keys)
+
+    def build_tables(self, keys):
+        tables = {}
+        for location in LOCATIONS:
+            table = {}
+            for key in keys:
+                swapped = SIDE_SWAP.get(key, key) if location == 'right' else key
+                table[key] = self.keycode(swapped)
+            tables[location] = table
+        return tables
+
+    def set_keys(self, keys):
+        """指令库更新后重建键码表，整体替换，执行线程不会看到半张表"""
+        self.tables = self.build_tables(keys)
+
+    def keycode(self, key):
+        """把按键名转换成后端的原生键码"""
+        raise NotImplementedError
+
+    def send(self, actions):
+        """发出同一帧的按键动作，actions 为 [(键码, 是否按下)]"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class KeyboardOutput(KeyOutput):
+    """keyboard 库，跨平台但每个按键一次系统调用；预先转成扫描码，省掉每次按键的名称解析"""
+
+    def __init__(self, keys):
+        import keyboard
+        self.keyboard = keyboard
+        super().__init__(keys)
+
+    def keycode(self, key):
+        return self.keyboard.key_to_scan_codes(key)[0]
+
+    def send(self, actions):
+        for code, down in actions:
+            if down:
+                self.keyboard.press(code)
+            else:
+                self.keyboard.release(code)
+
+
+class UinputOutput(KeyOutput):
+    """Linux uinput 虚拟键盘（需要 python-evdev 和 /dev/uinput 写权限）
+
+    同一帧的所有按键事件加一个 SYN_REPORT 拼成一块，一次 write 写入，
+    游戏读到的同时按键一定落在同一个输入报告里。同一帧里先松开又按下的键，
+    中间插一个 SYN_REPORT，免得按报告读取状态的程序把两次输入合成一次。
+    虚拟设备创建后不能再增加按键，所以预先声明全部字母和数字键。
+    """
+
+    # struct input_event: timeval(两个 long)、type、code、value；时间由内核填写
+    EVENT_FORMAT = 'llHHi'
+
+    def __init__(self, keys, name='voice-sf6-keyboard', key_codes=None):
+        from evdev import UInput, ecodes
+        self.ecodes = ecodes
+        self.key_codes = key_codes or {}
+        super().__init__(keys)
+        base = [ecodes.ecodes[f'KEY_{c}'] for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789']
+        codes = sorted(set(base) | {code for table in self.tables.values() for code in table.values()})
+        self.codes = set(codes)
+        self.device = UInput({ecodes.EV_KEY: codes}, name=name)
+        self.syn = struct.pack(self.EVENT_FORMAT, 0, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+        # 每个键码的按下/松开事件也预先打包好
+        self.packed = {(code, down): struct.pack(self.EVENT_FORMAT, 0, 0, ecodes.EV_KEY, code, int(down))
+                       for code in codes for down in (True, False)}
+
+    def keycode(self, key):
+        if key in self.key_codes:
+            return self.key_codes[key]
+        name = 'KEY_' + key.upper()
+        if name not in self.ecodes.ecodes:
+            raise ValueError(f"uinput 不认识按键: {key!r}，可在 EXECUTOR_CONFIG['KEY_CODES'] 中指定键码")
+        return self.ecodes.ecodes[name]
+
+    def set_keys(self, keys):
+        tables = self.build_tables(keys)
+        missing = {code for table in tables.values() for code in table.values()} - self.codes
+        if missing:
+            raise ValueError(f"uinput 设备未声明键码 {sorted(missing)}，需要重启后生效")
+        self.tables = tables
+
+    def send(self, actions):
+        chunks = []
+        released = set()
+        for code, down in actions:
+            if not down:
+                released.add(code)
+            elif code in released:
+                chunks.append(self.syn)
+                released.clear()
+            chunks.append(self.packed[(code, down)])
+        chunks.append(self.syn)
+        os.write(self.device.fd, b''.join(chunks))
+
+    def close(self):
+        self.device.close()
+
+
+class RecordingOutput(KeyOutput):
+    """只在内存里记录按键，不真正发出，供测试和基准测试使用
+
+    max_batches 给出时只保留最近的这么多帧，长时间运行的只识别会话不会无限占用内存。
+    """
+
+    def __init__(self, keys, max_batches=None):
+        super().__init__(keys)
+        self.batches = deque(maxlen=max_batches)  # (monotonic, ((按键, 是否按下), ...))，每帧一条
+
+    def keycode(self, key):
+        return key
+
+    def send(self, actions):
+        self.batches.append((time.monotonic(), tuple(actions)))
+
+    @property
+    def events(self):
+        """展开成逐个按键事件: (monotonic, 'press'/'release', 按键)"""
+        return [(t, 'press' if down else 'release', key) for t, batch in self.batches for key, down in batch]
+
+
+def create_output(config, keys):
+    """按 EXECUTOR_CONFIG['OUTPUT'] 创建输出后端"""
+    name = config.get('OUTPUT', 'keyboard')
+    if name == 'keyboard':
+        return KeyboardOutput(keys)
+    if name == 'uinput':
+        return UinputOutput(keys, config.get('UINPUT_NAME', 'voice-sf6-keyboard'), config.get('KEY_CODES'))
+    if name == 'recording':
+        return RecordingOutput(keys, config.get('RECORDING_MAX_BATCHES'))
+    raise ValueError(f"未知的按键输出后端: {name}")
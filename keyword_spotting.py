@@ -0,0 +1,57 @@
+import time
+import traceback
+
+from command_matcher import normalize_text
+
+
+def parse_kws_text(text):
+    """解析关键词检测输出，如 "detected 升 0.2286" / "rejected"，返回 (关键词, 分数) 或 None"""
+    parts = text.split()
+    if len(parts) < 3 or parts[0] != 'detected':
+        return None
+    try:
+        score = float(parts[-1])
+    except ValueError:
+        return None
+    return "".join(parts[1:-1]), score
+
+
+class KeywordSpotter:
+    """只认指令短语的轻量关键词检测，作为 paraformer 之前的第一级
+
+    置信度达到阈值的语音段直接给出指令，其余的仍交给完整识别。
+    """
+
+    def __init__(self, model, keywords, threshold=0.3, output_dir="./outputs/debug", device='cpu'):
+        self.threshold = threshold
+        # 检测结果里的关键词按归一化写法对应回指令名
+        self.commands = {normalize_text(k): k for k in keywords}
+        print("正在加载关键词检测模型...")
+        start_time = time.time()
+        from funasr import AutoModel
+        self.model = AutoModel(
+            model=model,
+            keywords=",".join(keywords),
+            output_dir=output_dir,
+            device=device
+        )
+        print(f"关键词检测模型加载完成，耗时: {time.time() - start_time:.2f}秒")
+
+    def detect(self, samples):
+        """检测一段语音，置信度足够时返回 (指令, 分数)，否则返回 None"""
+        try:
+            res = self.model.generate(input=samples, cache={})
+        except Exception as e:
+            print(f"关键词检测错误: {e}")
+            traceback.print_exc()
+            return None
+        if not res:
+            return None
+        detection = parse_kws_text(res[0].get('text', ''))
+        if detection is None:
+            return None
+        keyword, score = detection
+        command = self.commands.get(normalize_text(keyword))
+        if command is None or score < self.threshold:
+            return None
+        return command, score
@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import threading
+from queue import Empty, Full
+
+# 一条语音从说出到按键的各个阶段
+ONSET = 'onset'  # 语音起点（采集）
+ENDPOINT = 'endpoint'  # 断句（采集）
+DEQUEUE = 'dequeue'  # 识别进程取出
+INFERENCE_START = 'inference_start'
+INFERENCE_END = 'inference_end'
+MATCH = 'match'  # 匹配到指令并送入执行队列
+FIRST_PRESS = 'first_press'
+LAST_RELEASE = 'last_release'
+
+
+class Tracer:
+    """各进程里打点用，只往队列里放一个元组，写文件由主进程的 TraceWriter 负责
+
+    trace_queue 为 None 时所有打点都是空操作。时间统一用 time.monotonic。
+    """
+
+    def __init__(self, trace_queue=None):
+        self.trace_queue = trace_queue
+
+    def stamp(self, trace_id, stage, t=None, **args):
+        if self.trace_queue is None or trace_id is None:
+            return
+        try:
+            self.trace_queue.put_nowait((trace_id, stage, time.monotonic() if t is None else t, os.getpid(), args))
+        except Full:
+            # 打点绝不阻塞热路径，队列满了直接丢
+            pass
+
+
+class TraceWriter:
+    """在主进程后台线程里把打点写成 Chrome trace（chrome://tracing / Perfetto 可打开）或 JSONL"""
+
+    def __init__(self, trace_queue, stop_event, path, fmt='chrome'):
+        self.trace_queue = trace_queue
+        self.stop_event = stop_event
+        self.path = path
+        self.fmt = fmt
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            if self.fmt == 'chrome':
+                # 数组不闭合也能被 Chrome trace 查看器读取，方便边跑边写
+                f.write('[\n')
+            while not self.stop_event.is_set() or not self.trace_queue.empty():
+                try:
+                    trace_id, stage, t, pid, args = self.trace_queue.get(timeout=0.1)
+                except Empty:
+                    continue
+                except (EOFError, OSError):
+                    break
+                f.write(self.format(trace_id, stage, t, pid, args))
+                f.write(',\n' if self.fmt == 'chrome' else '\n')
+                if self.trace_queue.empty():
+                    f.flush()
+
+    def format(self, trace_id, stage, t, pid, args):
+        if self.fmt == 'chrome':
+            # 每条语音占一行(tid)，各阶段为瞬时事件
+            return json.dumps({'name': stage, 'ph': 'i', 's': 't', 'ts': round(t * 1e6, 1),
+                               'pid': pid, 'tid': trace_id, 'args': args}, ensure_ascii=False)
+        return json.dumps({'trace_id': trace_id, 'stage': stage, 't': t, 'pid': pid, **args},
+                          ensure_ascii=False)
@@ -0,0 +1,119 @@
+import multiprocessing as mp
+import time
+import threading
+from audio_capture import AudioCapture
+from audio_source import MicrophoneSource
+from command_executor import CommandExecutor
+from command_compiler import command_keys
+from cpu_placement import collect_placement, print_placement_report
+from key_output import create_output
+from metrics import MetricsRegistry, MetricsServer
+from recognition_server import RecognitionServer, RecognitionSession
+from shared_audio import SharedAudioQueue
+from config import (AUDIO_CONFIG, TRANSPORT_CONFIG, RECOGNITION_CONFIG, CPU_CONFIG, EXECUTOR_CONFIG, SERVER_CONFIG,
+                    METRICS_CONFIG)
+
+
+# ==================== 主程序（多路识别服务） ====================
+def main():
+    sessions_config = SERVER_CONFIG['SESSIONS']
+    print(f"启动语音控制街霸系统（多路识别服务，{len(sessions_config)}路）...")
+
+    stop_event = mp.Event()
+    ready_event = mp.Event()  # 识别服务模型加载并预热完成
+    placement_queue = mp.Queue() if CPU_CONFIG['ENABLED'] else None
+    # 各路共用一份运行指标
+    metrics = MetricsRegistry() if METRICS_CONFIG['ENABLED'] else None
+
+    # 每路会话各自的音频队列、指令队列和执行线程
+    audio_queues = []
+    sessions = []
+    executors = []
+    for conf in sessions_config:
+        if TRANSPORT_CONFIG['SHARED_MEMORY']:
+            capacity = int(AUDIO_CONFIG['RATE'] * 2 * TRANSPORT_CONFIG['RING_SECONDS'])
+            audio_queue = SharedAudioQueue(capacity, maxsize=TRANSPORT_CONFIG['MAX_SEGMENTS'])
+        else:
+            audio_queue = mp.Queue(maxsize=TRANSPORT_CONFIG['MAX_SEGMENTS'])
+        command_queue = mp.Queue(maxsize=10)
+        audio_queues.append(audio_queue)
+        sessions.append(RecognitionSession(conf['NAME'], audio_queue, command_queue, stop_event, conf['COMMANDS'],
+                                           metrics))
+        # 先编译指令表，映射有误时在启动阶段就失败
+        library = sessions[-1].library
+        output_config = dict(EXECUTOR_CONFIG, OUTPUT=conf['OUTPUT'],
+                             UINPUT_NAME=f"{EXECUTOR_CONFIG['UINPUT_NAME']}-{conf['NAME']}")
+        output = create_output(output_config, command_keys(library.compiled))
+        executors.append(CommandExecutor(command_queue, stop_event, placement_queue, output=output,
+                                         library_path=conf['COMMANDS'], location=conf['LOCATION'], metrics=metrics))
+
+    server_process = None
+    audio_processes = []
+    command_threads = []
+    metrics_server = None
+    try:
+        # 端口被占用时也要走到 finally 释放共享内存
+        if metrics is not None:
+            metrics_server = MetricsServer(metrics, METRICS_CONFIG['HOST'], METRICS_CONFIG['PORT'])
+            metrics_server.start()
+
+        # 只启动一个识别服务进程，所有会话共享模型
+        server = RecognitionServer(sessions, stop_event, ready_event, placement_queue, metrics)
+        server_process = mp.Process(target=server.start)
+        server_process.start()
+
+        start_time = time.time()
+        while not ready_event.wait(0.5):
+            if not server_process.is_alive():
+                raise RuntimeError("识别服务进程启动失败")
+            if time.time() - start_time > RECOGNITION_CONFIG['READY_TIMEOUT_S']:
+                raise RuntimeError("等待识别服务进程就绪超时")
+        print(f"识别服务就绪，等待 {time.time() - start_time:.2f}秒")
+
+        for conf, audio_queue, executor in zip(sessions_config, audio_queues, executors):
+            source = MicrophoneSource(conf['INPUT_DEVICE_INDEX'])
+            audio_capture = AudioCapture(audio_queue, stop_event, placement_queue=placement_queue, source=source,
+                                         metrics=metrics)
+            process = mp.Process(target=audio_capture.start)
+            process.start()
+            audio_processes.append(process)
+
+            thread = threading.Thread(target=executor.start)
+            thread.start()
+            command_threads.append(thread)
+
+        if placement_queue is not None:
+            print_placement_report(collect_placement(placement_queue, 1 + 2 * len(sessions_config)))
+
+        print("系统运行中... 按Ctrl+C停止")
+        while True:
+            time.sleep(1)
+
+    except KeyboardInterrupt:
+        print("正在停止系统...")
+    finally:
+        stop_event.set()
+
+        processes = audio_processes + ([server_process] if server_process is not None else [])
+        for worker in processes + command_threads:
+            worker.join(timeout=2)
+
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        for audio_queue in audio_queues:
+            if isinstance(audio_queue, SharedAudioQueue):
+                audio_queue.close()
+                audio_queue.unlink()
+
+        if metrics_server is not None:
+            metrics_server.stop()
+        if metrics is not None:
+            metrics.close()
+            metrics.unlink()
+
+        print("系统已停止")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import multiprocessing as mp
+import time
+import threading
+from audio_capture import AudioCapture
+from command_executor import CommandExecutor
+from cpu_placement import collect_placement, print_placement_report
+from latency_trace import TraceWriter
+from metrics import MetricsRegistry, MetricsServer
+from speech_recognition import StreamingSpeechRecognition
+from config import RECOGNITION_CONFIG, CPU_CONFIG, TRACE_CONFIG, METRICS_CONFIG
+
+
+# ==================== 主程序（流式识别） ====================
+def main():
+    print("启动语音控制街霸系统（流式识别）...")
+
+    # 创建进程间通信队列，流式模式下音频按10ms小块传递
+    audio_queue = mp.Queue(maxsize=1000)  # 音频块队列
+    command_queue = mp.Queue(maxsize=10)  # 指令队列
+    stop_event = mp.Event()
+    ready_event = mp.Event()  # 识别进程模型加载并预热完成
+    # 各阶段回报实际生效的 CPU 布局
+    placement_queue = mp.Queue() if CPU_CONFIG['ENABLED'] else None
+    # 各阶段的延迟打点，由主进程后台线程写文件
+    trace_queue = mp.Queue(maxsize=10000) if TRACE_CONFIG['ENABLED'] else None
+    # 各进程共享的运行指标，由主进程后台线程对外提供
+    metrics = MetricsRegistry() if METRICS_CONFIG['ENABLED'] else None
+
+    # 先编译指令表，映射有误时在启动阶段就失败
+    command_executor = CommandExecutor(command_queue, stop_event, placement_queue, trace_queue, metrics=metrics)
+
+    # finally 里会用到，启动中途被打断时还没创建的保持为 None
+    audio_process = recognition_process = command_thread = None
+    trace_writer = None
+    if trace_queue is not None:
+        trace_writer = TraceWriter(trace_queue, stop_event, TRACE_CONFIG['PATH'], TRACE_CONFIG['FORMAT'])
+        trace_writer.start()
+    metrics_server = None
+
+    try:
+        # 端口被占用时也要走到 finally 释放共享内存
+        if metrics is not None:
+            metrics_server = MetricsServer(metrics, METRICS_CONFIG['HOST'], METRICS_CONFIG['PORT'])
+            metrics_server.start()
+
+        # 创建并启动流式语音识别进程
+        speech_recognition = StreamingSpeechRecognition(audio_queue, command_queue, stop_event, ready_event, placement_queue,
+                                                        trace_queue, metrics=metrics)
+        recognition_process = mp.Process(target=speech_recognition.start)
+        recognition_process.start()
+
+        # 模型就绪后再开始采集，避免语音积压在加载期间
+        start_time = time.time()
+        while not ready_event.wait(0.5):
+            if not recognition_process.is_alive():
+                raise RuntimeError("语音识别进程启动失败")
+            if time.time() - start_time > RECOGNITION_CONFIG['READY_TIMEOUT_S']:
+                raise RuntimeError("等待语音识别进程就绪超时")
+        print(f"语音识别就绪，等待 {time.time() - start_time:.2f}秒")
+
+        # 创建并启动音频采集进程
+        audio_capture = AudioCapture(audio_queue, stop_event, streaming=True, placement_queue=placement_queue,
+                                     trace_queue=trace_queue, metrics=metrics)
+        audio_process = mp.Process(target=audio_capture.start)
+        audio_process.start()
+
+        # 启动指令执行线程
+        command_thread = threading.Thread(target=command_executor.start)
+        command_thread.start()
+
+        if placement_queue is not None:
+            print_placement_report(collect_placement(placement_queue, 3))
+
+        print("系统运行中... 按Ctrl+C停止")
+        while True:
+            time.sleep(1)
+
+    except KeyboardInterrupt:
+        print("正在停止系统...")
+    finally:
+        stop_event.set()
+
+        # 等待进程结束，启动中途退出时部分进程可能还没创建
+        for worker in (audio_process, recognition_process, command_thread):
+            if worker is not None:
+                worker.join(timeout=2)
+
+        # 强制终止如果还在运行
+        for process in (audio_process, recognition_process):
+            if process is not None and process.is_alive():
+                process.terminate()
+
+        if trace_writer is not None:
+            trace_writer.thread.join(timeout=2)
+            print(f"延迟追踪已写入: {TRACE_CONFIG['PATH']}")
+
+        if metrics_server is not None:
+            metrics_server.stop()
+        if metrics is not None:
+            metrics.close()
+            metrics.unlink()
+
+        print("系统已停止")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import sys
+import time
+import threading
+import urllib.request
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from multiprocessing import shared_memory
+
+import numpy as np
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+# 指标定义: 名称 -> (类型, 说明, 直方图桶上界)
+METRICS = {
+    'voice_segments_total': (COUNTER, '采集端送出的语音段数', None),
+    'voice_segments_dropped_total': (COUNTER, '采集端因队列满或已被覆盖而丢弃的语音段数', None),
+    'voice_segments_stale_total': (COUNTER, '识别端取出时已过期而丢弃的语音段数', None),
+    'voice_audio_queue_depth': (GAUGE, '采集到识别之间排队的语音段数', None),
+    'voice_recognized_segments_total': (COUNTER, '识别进程处理的语音段数', None),
+    'voice_inference_seconds': (HISTOGRAM, '一批语音的推理耗时', (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)),
+    'voice_inference_rtf': (HISTOGRAM, '推理实时率（推理耗时/音频时长），大于 1 说明跟不上', (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)),
+    'voice_unmatched_total': (COUNTER, '识别出文本但没有匹配到指令的语音段数', None),
+    'voice_commands_total': (COUNTER, '执行的指令数', None),
+    'voice_command_queue_depth': (GAUGE, '执行端排队等待的指令数', None),
+    'voice_commands_expired_total': (COUNTER, '超过 TTL 丢弃的指令数', None),
+    'voice_commands_cancelled_total': (COUNTER, '被优先指令取消的指令数', None),
+    'voice_key_timing_error_ms': (HISTOGRAM, '每个按键事件相对帧截止时间的误差', (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)),
+}
+
+
+def _layout():
+    """每个指标在共享内存数组里的起始下标；直方图占 桶数+1(+Inf) 个计数、一个总和、一个次数"""
+    offsets = {}
+    size = 0
+    for name, (kind, _, buckets) in METRICS.items():
+        offsets[name] = size
+        size += len(buckets) + 3 if kind == HISTOGRAM else 1
+    return offsets, size
+
+
+class MetricsRegistry:
+    """跨进程共享的指标，数值存在一块共享内存的 float64 数组里
+
+    主进程创建后随各阶段对象传给子进程，子进程按名称重新映射同一块内存；
+    更新只是对数组元素的读改写，不加锁，每个指标应只由一个进程写；
+    多路识别服务里各路采集进程共用同一组采集计数，同时更新时偶尔会少记一次，只作观察用。
+    create=False 时不分配内存，所有更新都是空操作，关闭指标时使用。
+    """
+
+    def __init__(self, create=True):
+        self.offsets, self.size = _layout()
+        self.shm = None
+        self.values = None
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.size * 8)
+            self.values = np.ndarray(self.size, dtype=np.float64, buffer=self.shm.buf)
+            self.values[:] = 0
+
+    def inc(self, name, amount=1):
+        if self.values is not None:
+            self.values[self.offsets[name]] += amount
+
+    def set(self, name, value):
+        if self.values is not None:
+            self.values[self.offsets[name]] = value
+
+    def observe(self, name, value):
+        """直方图记一个样本，按桶上界找到所在的桶"""
+        if self.values is None:
+            return
+        buckets = METRICS[name][2]
+        base = self.offsets[name]
+        self.values[base + bisect_left(buckets, value)] += 1
+        self.values[base + len(buckets) + 1] += value
+        self.values[base + len(buckets) + 2] += 1
+
+    def render(self):
+        """导出 Prometheus 文本格式"""
+        values = self.values.copy() if self.values is not None else np.zeros(self.size)
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            base = self.offsets[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind != HISTOGRAM:
+                lines.append(f"{name} {values[base]:g}")
+                continue
+            cumulative = 0
+            for i, bound in enumerate(buckets):
+                cumulative += values[base + i]
+                lines.append(f'{name}_bucket{{le="{bound:g}"}} {cumulative:g}')
+            cumulative += values[base + len(buckets)]
+            lines.append(f'{name}_bucket{{le="+Inf"}} {cumulative:g}')
+            lines.append(f"{name}_sum {values[base + len(buckets) + 1]:g}")
+            lines.append(f"{name}_count {values[base + len(buckets) + 2]:g}")
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        if self.shm is not None:
+            self.values = None
+            self.shm.close()
+
+    def unlink(self):
+        """由创建方在系统退出时调用，删除共享内存"""
+        if self.shm is not None:
+            self.shm.unlink()
+
+    def __getstate__(self):
+        return {'name': self.shm.name if self.shm is not None else None}
+
+    def __setstate__(self, state):
+        self.offsets, self.size = _layout()
+        self.shm = self.values = None
+        if state['name'] is not None:
+            self.shm = shared_memory.SharedMemory(name=state['name'])
+            self.values = np.ndarray(self.size, dtype=np.float64, buffer=self.shm.buf)
+
+
+# 关闭指标时各阶段共用的空实现
+NULL_METRICS = MetricsRegistry(create=False)
+
+
+class MetricsServer:
+    """在主进程后台线程里提供 http://HOST:PORT/metrics（Prometheus 文本格式）"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9464):
+        registry_ = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry_.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        print(f"指标: http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def parse_metrics(text):
+    """把 Prometheus 文本解析成 {名称(含标签): 数值}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        name, value = line.rsplit(' ', 1)
+        samples[name] = float(value)
+    return samples
+
+
+def histogram_quantile(samples, name, q):
+    """按桶估算分位数（取所在桶的上界），没有样本返回 None"""
+    buckets = [(float(key.split('"')[1]), value) for key, value in samples.items()
+               if key.startswith(f'{name}_bucket{{')]
+    buckets.sort()
+    total = samples.get(f'{name}_count', 0)
+    if not total:
+        return None
+    for bound, count in buckets:
+        if count >= q * total:
+            return bound
+    return float('inf')
+
+
+def render_dashboard(current, previous, elapsed):
+    """一屏紧凑的运行状态，速率按两次抓取的差值计算"""
+    def rate(name):
+        if previous is None or elapsed <= 0:
+            return 0.0
+        return (current.get(name, 0) - previous.get(name, 0)) / elapsed
+
+    def quantile(name, q):
+        value = histogram_quantile(current, name, q)
+        return '-' if value is None else f"≤{value:g}"
+
+    rtf_count = current.get('voice_inference_rtf_count', 0)
+    rtf_mean = current.get('voice_inference_rtf_sum', 0) / rtf_count if rtf_count else 0
+    return '\n'.join([
+        f"采集  段/秒 {rate('voice_segments_total'):6.2f}  丢弃 {current.get('voice_segments_dropped_total', 0):.0f}"
+        f"  过期 {current.get('voice_segments_stale_total', 0):.0f}  音频队列 {current.get('voice_audio_queue_depth', 0):.0f}",
+        f"识别  段/秒 {rate('voice_recognized_segments_total'):6.2f}  RTF 平均 {rtf_mean:.3f} p90 {quantile('voice_inference_rtf', 0.9)}"
+        f"  推理 p90 {quantile('voice_inference_seconds', 0.9)}s  未匹配 {current.get('voice_unmatched_total', 0):.0f}",
+        f"执行  指令 {current.get('voice_commands_total', 0):.0f}  排队 {current.get('voice_command_queue_depth', 0):.0f}"
+        f"  过期 {current.get('voice_commands_expired_total', 0):.0f}  取消 {current.get('voice_commands_cancelled_total', 0):.0f}"
+        f"  按键误差 p50 {quantile('voice_key_timing_error_ms', 0.5)}ms p99 {quantile('voice_key_timing_error_ms', 0.99)}ms",
+    ])
+
+
+def main():
+    """终端看板: python metrics.py [http://127.0.0.1:9464/metrics] [刷新间隔秒]"""
+    url = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:9464/metrics'
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    previous = None
+    last = time.monotonic()
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=interval) as response:
+                current = parse_metrics(response.read().decode('utf-8'))
+        except OSError as e:
+            print(f"读取指标失败: {e}")
+            time.sleep(interval)
+            continue
+        now = time.monotonic()
+        # 清屏后回到左上角重画
+        sys.stdout.write('\033[2J\033[H' + render_dashboard(current, previous, now - last) + '\n')
+        sys.stdout.flush()
+        previous, last = current, now
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
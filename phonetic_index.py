@@ -0,0 +1,105 @@
+from itertools import combinations
+
+from pypinyin import lazy_pinyin, Style
+
+from command_matcher import normalize_text
+
+# 常见的模糊音，平翘舌、前后鼻音统一成同一个写法
+_FUZZY_INITIALS = (('zh', 'z'), ('ch', 'c'), ('sh', 's'))
+_FUZZY_FINALS = (('ang', 'an'), ('eng', 'en'), ('ing', 'in'))
+
+
+def _fuzzy(syllable):
+    for src, dst in _FUZZY_INITIALS:
+        if syllable.startswith(src):
+            syllable = dst + syllable[len(src):]
+            break
+    for src, dst in _FUZZY_FINALS:
+        if syllable.endswith(src):
+            syllable = syllable[:-len(src)] + dst
+            break
+    return syllable
+
+
+def to_phonetic(text):
+    """把文本转成读音序列: 汉字为去声调、合并模糊音后的拼音，英文数字逐个字母"""
+    text = normalize_text(text)
+    return tuple(_fuzzy(s) for s in lazy_pinyin(text, style=Style.NORMAL, errors=lambda s: list(s)))
+
+
+def edit_distance(a, b):
+    """两个序列的编辑距离"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def _deletes(phonetic, max_distance):
+    """删掉至多 max_distance 个音节得到的所有变体（含自身）"""
+    variants = set()
+    for n in range(min(max_distance, len(phonetic)) + 1):
+        for removed in combinations(range(len(phonetic)), n):
+            variants.add(tuple(s for i, s in enumerate(phonetic) if i not in removed))
+    return variants
+
+
+class PhoneticIndex:
+    """指令名的读音模糊索引
+
+    识别文本不能精确命中指令时，按音节编辑距离找最近的指令。
+    采用删除邻域索引：启动时为每个指令预生成删掉至多 k 个音节的变体，
+    查询时只需生成查询自身的删除变体查表，再对少量候选精确计算距离，
+    与指令总数基本无关。
+    """
+
+    def __init__(self, commands, max_distance=1, max_ratio=0.5):
+        self.max_distance = max_distance
+        self.max_ratio = max_ratio
+        self.phonetics = {}  # 指令 -> 读音序列
+        self.variants = {}  # 删除变体 -> 指令集合
+        for command in commands:
+            phonetic = to_phonetic(command)
+            self.phonetics[command] = phonetic
+            for variant in _deletes(phonetic, max_distance):
+                self.variants.setdefault(variant, set()).add(command)
+
+    def search(self, text):
+        """返回距离不超过阈值的所有 (指令, 距离)，按距离排序"""
+        phonetic = to_phonetic(text)
+        if not phonetic:
+            return []
+        candidates = set()
+        for variant in _deletes(phonetic, self.max_distance):
+            candidates |= self.variants.get(variant, set())
+        found = []
+        for command in candidates:
+            d = edit_distance(phonetic, self.phonetics[command])
+            if d <= self.max_distance:
+                found.append((command, d))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def lookup(self, text):
+        """找最近的指令，返回 (指令, 距离)；超出阈值或无法区分时返回 None"""
+        found = self.search(text)
+        if not found:
+            return None
+        best = found[0][1]
+        # 距离相对指令长度过大视为误识别，直接拒绝
+        nearest = [c for c, d in found if d == best and d <= self.max_ratio * len(self.phonetics[c])]
+        if not nearest:
+            return None
+        if len(nearest) > 1:
+            # 读音同样接近（如 中拳/重拳），按字面差异挑选，仍分不出则放弃
+            text = normalize_text(text)
+            scored = sorted((edit_distance(text, normalize_text(c)), c) for c in nearest)
+            if scored[0][0] == scored[1][0]:
+                return None
+            return scored[0][1], best
+        return nearest[0], best
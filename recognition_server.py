@@ -0,0 +1,107 @@
+import time
+from multiprocessing import Queue, Event
+
+from speech_recognition import SpeechRecognition
+from config import RECOGNITION_CONFIG, SERVER_CONFIG
+
+
+class RecognitionSession(SpeechRecognition):
+    """识别服务里的一路会话: 自己的音频队列、指令库和指令队列，模型由服务进程共享"""
+
+    def __init__(self, name, audio_queue: Queue, command_queue: Queue, stop_event: Event, library_path=None,
+                 metrics=None):
+        super().__init__(audio_queue, command_queue, stop_event, library_path=library_path, metrics=metrics)
+        self.name = name
+
+    def apply_library(self, library):
+        # 热词是所有会话的并集，由服务进程统一更新
+        self.library = library
+        self.phonetic_index = library.phonetic_index
+
+
+class RecognitionServer(SpeechRecognition):
+    """多路识别服务: 只加载一份模型，同时服务多个采集端
+
+    各会话轮流取语音段，每轮每个会话最多一段，起始会话逐批轮换，
+    不会因为某一路说得多而饿死其他路；取到的段合成一批一起推理，
+    结果再按所属会话各自匹配指令、送进各自的指令队列。
+    """
+
+    def __init__(self, sessions, stop_event: Event, ready_event: Event = None, placement_queue: Queue = None,
+                 metrics=None):
+        super().__init__(None, None, stop_event, ready_event, placement_queue,
+                         library_path=sessions[0].library_path, metrics=metrics)
+        self.sessions = sessions
+        self.next_session = 0  # 下一批从哪个会话开始取
+
+    def command_names(self):
+        """所有会话指令名的并集，作为共享模型的热词和关键词；命中的指令不在该会话指令库里时交给完整识别"""
+        names = {}
+        for session in self.sessions:
+            names.update(dict.fromkeys(session.library.mapping))
+        return list(names)
+
+    def queue_depth(self):
+        return sum(session.queue_depth() for session in self.sessions)
+
+    def watch_library(self):
+        for session in self.sessions:
+            session.watch_library()
+
+    def apply_pending_library(self):
+        changed = False
+        for session in self.sessions:
+            changed |= session.apply_pending_library()
+        if changed:
+            self.model.set_keywords(self.command_names())
+        return changed
+
+    def start(self):
+        """启动识别服务进程"""
+        print(f"识别服务进程启动，{len(self.sessions)}路会话: {', '.join(s.name for s in self.sessions)}")
+        self.load_model()
+        self.watch_library()
+
+        idle = SERVER_CONFIG['IDLE_POLL_MS'] / 1000
+        while not self.stop_event.is_set():
+            self.apply_pending_library()
+            self.heartbeat.beat()
+            batch, owners = self.collect_batch()
+            if batch:
+                self.process_audio(batch, owners)
+            else:
+                # 多个队列无法一起阻塞等待，空闲时短暂休眠后再轮询
+                time.sleep(idle)
+        self.close_recorder()
+
+    def collect_batch(self):
+        """按会话轮流取语音段组成一批，返回 (语音段列表, 所属会话列表)"""
+        batch = []
+        owners = []
+        seconds = 0.0
+        count = len(self.sessions)
+        order = [self.sessions[(self.next_session + i) % count] for i in range(count)]
+        self.next_session = (self.next_session + 1) % count
+        full = False
+        while not full:
+            took = False
+            for session in order:
+                if len(batch) >= RECOGNITION_CONFIG['BATCH_MAX_SEGMENTS']:
+                    full = True
+                    break
+                segment = session.take_segment()
+                if segment is None:
+                    continue
+                duration = len(segment.pcm) / 16000
+                if batch and seconds + duration > RECOGNITION_CONFIG['BATCH_MAX_SECONDS']:
+                    # 放不下的段留给该会话的下一批
+                    session.carry = segment
+                    full = True
+                    break
+                batch.append(segment)
+                owners.append(session)
+                seconds += duration
+                took = True
+            if not took:
+                break
+        return batch, owners
@@ -0,0 +1,52 @@
+class AudioRingBuffer:
+    """预分配的定长音频环形缓冲区
+
+    写入只做一次内存拷贝，不会随语音变长而重新分配；位置用累计写入字节数表示，
+    取片段时返回指向缓冲区的 memoryview（跨越末尾时为两段），不额外拷贝。
+    单写单读：写入方是采集回调，读取方需在数据被覆盖前取走。
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.written = 0  # 累计写入的字节数
+
+    def write(self, data):
+        """写入一块数据，返回写入后的累计位置"""
+        data = memoryview(data)
+        n = len(data)
+        if n > self.capacity:
+            # 单块超过容量时只保留最后 capacity 字节
+            data = data[n - self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        pos = self.written % self.capacity
+        first = min(n, self.capacity - pos)
+        self.view[pos:pos + first] = data[:first]
+        if first < n:
+            self.view[:n - first] = data[first:]
+        self.written += n
+        return self.written
+
+    def available(self, start):
+        """start 处的数据是否仍在缓冲区中（未被覆盖）"""
+        return self.written - start <= self.capacity
+
+    def segment(self, start, end):
+        """返回 [start, end) 的零拷贝视图列表"""
+        if not self.available(start):
+            raise IndexError("环形缓冲区数据已被覆盖")
+        begin = start % self.capacity
+        length = end - start
+        if begin + length <= self.capacity:
+            return [self.view[begin:begin + length]]
+        first = self.capacity - begin
+        return [self.view[begin:], self.view[:length - first]]
+
+    def read(self, start, end):
+        """把 [start, end) 拷贝成 bytes，拷贝期间被覆盖则抛出 IndexError"""
+        data = b''.join(self.segment(start, end))
+        if not self.available(start):
+            raise IndexError("环形缓冲区数据已被覆盖")
+        return data
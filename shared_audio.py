@@ -0,0 +1,83 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from queue import Full
+
+from audio_segment import AudioSegment
+
+
+class SharedAudioQueue:
+    """基于共享内存的音频段队列，可直接替换 audio_queue
+
+    PCM 数据写进一块共享内存环形区，进程间队列里只传 (起点, 长度, 时间戳, trace id) 描述符，
+    识别进程拿到的是指向共享内存的 memoryview，不经过 pickle 和管道。
+    单生产者单消费者: get 返回的数据在下一次 get 之前有效，之后该空间会被回收复用。
+    """
+
+    def __init__(self, capacity, maxsize=100):
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity)
+        self.descriptors = mp.Queue(maxsize=maxsize)
+        self.consumed = mp.Value('q', 0, lock=False)  # 消费者已释放到的累计位置
+        # 生产者已写入的累计位置，放在共享内存里，采集进程重启后接着写，不会覆盖还在排队的数据
+        self.written = mp.Value('q', 0, lock=False)
+        self.holding = None  # 消费者尚未释放的段终点（仅在消费者进程中使用）
+        self.dropped = 0
+
+    def put(self, segment, block=True, timeout=None):
+        """写入一段语音；共享内存放不下时抛出 queue.Full"""
+        pcm = segment.pcm
+        n = len(pcm)
+        if n > self.capacity:
+            raise Full("语音段超过共享内存容量")
+        start = self.written.value
+        pos = start % self.capacity
+        if pos + n > self.capacity:
+            # 段不跨越末尾，尾部剩余空间直接跳过
+            start += self.capacity - pos
+            pos = 0
+        if start + n - self.consumed.value > self.capacity:
+            self.dropped += 1
+            raise Full("共享内存音频区已满")
+        self.shm.buf[pos:pos + n] = pcm
+        self.descriptors.put((start, n, segment.onset, segment.endpoint, segment.trace_id), block, timeout)
+        self.written.value = start + n
+
+    def get(self, block=True, timeout=None):
+        """取出一段语音，pcm 为共享内存上的只读视图"""
+        self.release()
+        start, n, onset, endpoint, trace_id = self.descriptors.get(block, timeout)
+        pos = start % self.capacity
+        self.holding = start + n
+        return AudioSegment(self.shm.buf[pos:pos + n].toreadonly(), onset, endpoint, trace_id)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def release(self):
+        """释放上一次 get 得到的数据所占的空间"""
+        if self.holding is not None:
+            self.consumed.value = self.holding
+            self.holding = None
+
+    def qsize(self):
+        return self.descriptors.qsize()
+
+    def empty(self):
+        return self.descriptors.empty()
+
+    def close(self):
+        self.descriptors.close()
+        try:
+            self.shm.close()
+        except BufferError:
+            # 仍有视图引用共享内存，交给进程退出时回收
+            pass
+
+    def unlink(self):
+        """由创建方在系统退出时调用，删除共享内存"""
+        self.shm.unlink()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['holding'] = None
+        return state
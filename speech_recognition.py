@@ -1,49 +1,444 @@
+import os
+import glob
 import time
 from multiprocessing import Queue, Event
-from queue import Empty
+from queue import Empty, Full
 
 import funASR_no_streaming
-from config import COMMAND_MAPPING
+from audio_segment import pcm_to_float
+import funASR_streaming
+from command_matcher import PrefixCommandMatcher
+from keyword_spotting import KeywordSpotter
+from cpu_placement import apply_placement
+from command_request import CommandRequest, SpeculationRequest
+from latency_trace import Tracer, DEQUEUE, INFERENCE_START, INFERENCE_END, MATCH
+from command_library import load_library, CommandLibraryWatcher
+from debug_store import DebugRecorder
+from metrics import NULL_METRICS
+from supervisor import NULL_HEARTBEAT
+from config import (STREAMING_CONFIG, MATCHER_CONFIG, RECOGNITION_CONFIG, KWS_CONFIG,
+                    COMMAND_LIBRARY_CONFIG, SPECULATION_CONFIG, SEGMENTER_CONFIG, DEBUG_STORE_CONFIG)
+
 
 class SpeechRecognition:
-    def __init__(self, audio_queue: Queue, command_queue: Queue, stop_event: Event):
+    def __init__(self, audio_queue: Queue, command_queue: Queue, stop_event: Event, ready_event: Event = None,
+                 placement_queue: Queue = None, trace_queue: Queue = None, library_path=None, metrics=None,
+                 heartbeat=None, active_event: Event = None):
         self.audio_queue = audio_queue
         self.command_queue = command_queue
         self.stop_event = stop_event
-        self.model = funASR_no_streaming.FunASR(keywords=COMMAND_MAPPING.keys())
+        self.ready_event = ready_event
+        self.placement_queue = placement_queue
+        self.tracer = Tracer(trace_queue)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        # 受主管监视时的心跳；active_event 未设置时作为热备，模型加载好后只等待，不取音频
+        self.heartbeat = heartbeat if heartbeat is not None else NULL_HEARTBEAT
+        self.active_event = active_event
+        # 模型在识别进程内部构建，避免在主进程加载后再随对象传给子进程
+        self.model = None
+        self.spotter = None  # 可选的关键词检测第一级
+        self.recorder = None  # 可选的调试语料记录，在识别进程里创建
+        # 指令库在主进程里先加载一次，有错误时启动即失败；运行中由监视线程热更新
+        self.library_path = library_path
+        self.library = load_library(library_path)
+        self.next_library = None  # 监视线程放进来的新指令库，由识别循环在两批之间切换
+        self.phonetic_index = self.library.phonetic_index
+        self.carry = None  # 上一批放不下、留到下一批的语音段
+        self.dropped = 0  # 因过期丢弃的语音段数
+
+    def command_names(self):
+        """作为热词和关键词的指令名"""
+        return list(self.library.mapping)
+
+    def create_model(self):
+        return funASR_no_streaming.FunASR(keywords=self.command_names())
+
+    def create_spotter(self):
+        if not KWS_CONFIG['ENABLED']:
+            return None
+        # 默认只用纯中文的指令名，音素模型不认英文字母
+        keywords = KWS_CONFIG['KEYWORDS'] or [k for k in self.command_names() if not any(c.isascii() for c in k)]
+        return KeywordSpotter(KWS_CONFIG['MODEL'], keywords, KWS_CONFIG['THRESHOLD'])
+
+    def create_recorder(self):
+        if not DEBUG_STORE_CONFIG['ENABLED']:
+            return None
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), DEBUG_STORE_CONFIG['DIR'])
+        return DebugRecorder(directory, DEBUG_STORE_CONFIG['MAX_BYTES'], DEBUG_STORE_CONFIG['COMPRESS'],
+                             DEBUG_STORE_CONFIG['MAX_PENDING']).start()
+
+    def close_recorder(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def load_model(self):
+        """构建并预热模型，完成后通知主进程可以开始采集"""
+        # torch 线程数必须在模型加载前设定
+        apply_placement('RECOGNITION', report_queue=self.placement_queue)
+        start_time = time.time()
+        self.model = self.create_model()
+        self.spotter = self.create_spotter()
+        self.recorder = self.create_recorder()
+        pattern = os.path.join(os.path.dirname(os.path.abspath(__file__)), RECOGNITION_CONFIG['WARMUP_FILES'])
+        self.model.warmup(sorted(glob.glob(pattern))[:RECOGNITION_CONFIG['WARMUP_COUNT']])
+        timings = self.model.timings
+        print(f"识别就绪: 导入{timings['import']:.2f}秒 加载{timings['load']:.2f}秒 "
+              f"预热{timings['warmup']:.2f}秒 合计{time.time() - start_time:.2f}秒")
+        # 就绪前先心跳一次，主管看到就绪时心跳已经是新的
+        self.heartbeat.beat()
+        if self.ready_event is not None:
+            self.ready_event.set()
 
     def start(self):
         """启动语音识别进程"""
         print("语音识别进程启动")
+        self.load_model()
+        self.watch_library()
 
         while not self.stop_event.is_set():
-            try:
-                audio_buffer = self.audio_queue.get(timeout=0.1)
-                self.process_audio(audio_buffer)
-            except Empty:
+            self.apply_pending_library()
+            if not self.wait_active():
+                continue
+            batch = self.collect_batch()
+            if batch:
+                self.process_audio(batch)
+        self.close_recorder()
+
+    def wait_active(self):
+        """心跳一次；作为热备时不取音频，等主管激活后返回 True"""
+        self.heartbeat.beat()
+        if self.active_event is None or self.active_event.is_set():
+            return True
+        if self.active_event.wait(0.1):
+            print("热备识别进程接管")
+            return True
+        return False
+
+    def watch_library(self):
+        """在识别进程里启动指令库监视线程"""
+        if COMMAND_LIBRARY_CONFIG['WATCH']:
+            CommandLibraryWatcher(self.on_library_change, self.stop_event, self.library_path,
+                                  digest=self.library.digest).start()
+
+    def on_library_change(self, library):
+        """监视线程回调，只记下最新的指令库"""
+        self.next_library = library
+
+    def apply_pending_library(self):
+        """在识别循环的空档切换到最新的指令库，模型保持不动；有切换时返回 True"""
+        library = self.next_library
+        if library is None or library is self.library:
+            return False
+        self.apply_library(library)
+        print(f"指令库已更新: {len(library.mapping)}条指令")
+        return True
+
+    def apply_library(self, library):
+        self.library = library
+        self.phonetic_index = library.phonetic_index
+        self.model.set_keywords(self.command_names())
+
+    def take_segment(self, timeout=None):
+        """取出一个未过期的语音段，timeout 为 None 时只取已经在排队的；没有可用的段返回 None"""
+        while True:
+            if self.carry is not None:
+                segment, self.carry = self.carry, None
+            else:
+                try:
+                    segment = self.audio_queue.get(timeout=timeout) if timeout else self.audio_queue.get_nowait()
+                except Empty:
+                    return None
+                self.tracer.stamp(segment.trace_id, DEQUEUE)
+                # 立即转换，数据随之拷出共享内存
+                segment = segment._replace(pcm=pcm_to_float(segment.pcm))
+
+            age = time.monotonic() - segment.endpoint
+            if age > RECOGNITION_CONFIG['STALE_AFTER_S']:
+                self.dropped += 1
+                self.metrics.inc('voice_segments_stale_total')
+                print(f"语音段已过期 {age:.2f}秒，丢弃（累计{self.dropped}段）")
                 continue
+            return segment
 
-    def process_audio(self, audio_buffer):
-        """处理音频数据"""
+    def queue_depth(self):
+        """采集到识别之间排队的语音段数，平台不支持 qsize 时返回 0"""
+        try:
+            return self.audio_queue.qsize()
+        except NotImplementedError:
+            return 0
+
+    def collect_batch(self):
+        """取出当前排队的语音段组成一批，按采集顺序排列，过期的段直接丢弃"""
+        batch = []
+        seconds = 0.0
+        while len(batch) < RECOGNITION_CONFIG['BATCH_MAX_SEGMENTS']:
+            # 第一段阻塞等待，之后只取已经在排队的
+            segment = self.take_segment(0.1 if not batch else None)
+            if segment is None:
+                break
+            duration = len(segment.pcm) / 16000
+            if batch and seconds + duration > RECOGNITION_CONFIG['BATCH_MAX_SECONDS']:
+                # 放不下的段留到下一批
+                self.carry = segment
+                break
+            batch.append(segment)
+            seconds += duration
+        return batch
+
+    def process_audio(self, batch, owners=None):
+        """处理一批音频数据
+
+        owners 与 batch 一一对应，给出每段语音所属的会话（有自己的指令库和指令队列），
+        缺省时全部属于自己。
+        """
+        owners = owners or [self] * len(batch)
         print('-' * 10)
         # 计算传入语音的时间长度
-        duration = len(audio_buffer) / 16000 / 2  # RATE/2
-        print(f"录音时长: {duration:.2f}秒")
+        duration = sum(len(segment.pcm) for segment in batch) / 16000
+        started = time.monotonic()
+        waited = started - batch[0].endpoint
+        print(f"录音时长: {duration:.2f}秒 段数: {len(batch)} 排队: {waited:.4f}秒")
+        self.metrics.set('voice_audio_queue_depth', self.queue_depth())
+        self.metrics.inc('voice_recognized_segments_total', len(batch))
 
-        # 记录识别开始时间
-        start_time = time.time()
-        result = self.model.generate(audio_buffer)
-        recognition_time = time.time() - start_time
+        # 第一级: 关键词检测有把握的段直接出指令
+        spotted = [None] * len(batch)
+        kws_time = None
+        if self.spotter is not None:
+            start_time = time.time()
+            for i, segment in enumerate(batch):
+                self.tracer.stamp(segment.trace_id, INFERENCE_START, model='kws')
+                detection = self.spotter.detect(segment.pcm)
+                self.tracer.stamp(segment.trace_id, INFERENCE_END, model='kws')
+                # 关键词模型的词表在加载时固定，指令库里已删掉的指令不再下发
+                if detection is not None and detection[0] in owners[i].library.mapping:
+                    spotted[i] = detection[0]
+                    print(f"关键词命中: {detection[0]} 分数: {detection[1]:.3f}")
+            kws_time = time.time() - start_time
+            print(f"关键词检测用时: {kws_time:.4f}秒")
+
+        # 第二级: 其余的段合并交给完整识别
+        pending = [i for i, command in enumerate(spotted) if command is None]
+        results = {}
+        recognition_time = None
+        if pending:
+            # 记录识别开始时间
+            start_time = time.time()
+            for i in pending:
+                self.tracer.stamp(batch[i].trace_id, INFERENCE_START, batch=len(pending))
+            # 推理期间没有心跳，主管按推理开始时刻判断是否卡死
+            self.heartbeat.busy()
+            decoded = self.model.generate_batch([batch[i].pcm for i in pending])
+            self.heartbeat.idle()
+            for i in pending:
+                self.tracer.stamp(batch[i].trace_id, INFERENCE_END, batch=len(pending))
+            recognition_time = time.time() - start_time
+            self.metrics.observe('voice_inference_seconds', recognition_time)
+            pending_seconds = sum(len(batch[i].pcm) for i in pending) / 16000
+            if pending_seconds > 0:
+                self.metrics.observe('voice_inference_rtf', recognition_time / pending_seconds)
+
+            print("识别结果:", decoded)
+            print(f"识别用时: {recognition_time:.4f}秒")
+            results = dict(zip(pending, decoded))
 
-        print("识别结果:", result)
-        print(f"识别用时: {recognition_time:.4f}秒")
-        self.map_to_execution(result)
+        # 按采集顺序依次下发
+        for i in range(len(batch)):
+            commands = []
+            if spotted[i] is not None:
+                owners[i].send_command(spotted[i], batch[i].trace_id, batch[i].endpoint)
+                commands = [spotted[i]]
+            elif i in results:
+                commands = owners[i].map_to_execution([results[i]], batch[i].trace_id, batch[i].endpoint)
+                if not commands and results[i].get('text', '').strip():
+                    self.metrics.inc('voice_unmatched_total')
+            if self.recorder is not None:
+                # 只放进内存队列，转换和写盘都在后台线程
+                self.recorder.record(batch[i].pcm, {
+                    'time': time.time(),
+                    'session': getattr(owners[i], 'name', None),
+                    'trace_id': batch[i].trace_id,
+                    'onset': batch[i].onset,
+                    'endpoint': batch[i].endpoint,
+                    'text': results[i]['text'] if i in results else None,
+                    'timestamp': results[i].get('timestamp') if i in results else None,
+                    'kws': spotted[i],
+                    'commands': commands,
+                    'batch': len(batch),
+                    'queue_s': started - batch[i].endpoint,
+                    'kws_s': kws_time,
+                    'inference_s': recognition_time if i in results else None,
+                })
 
-    def map_to_execution(self, recognition_result):
-        """映射识别结果到执行命令"""
+    def map_to_execution(self, recognition_result, trace_id=None, captured=None):
+        """映射识别结果到执行命令，一句话里连说的多条指令按说话顺序依次下发；返回下发的指令名列表"""
         if not recognition_result:
-            return
+            return []
         result_ = recognition_result[0]
         key = result_['text'].replace(" ", "")
-        if key in COMMAND_MAPPING.keys():
-            self.command_queue.put(key)
\ No newline at end of file
+        if key in self.library.mapping or not SEGMENTER_CONFIG['ENABLED']:
+            command = key if key in self.library.mapping else self.fuzzy_lookup(key)
+            if not command:
+                return []
+            self.send_command(command, trace_id, captured)
+            return [command]
+
+        spans = self.library.segmenter.segment(result_['text'], result_.get('timestamp'))
+        commands = []
+        for span in spans:
+            # 没被任何指令覆盖的文字按读音兜底，语气词之类找不到就跳过
+            command = span.command or self.fuzzy_lookup(span.text)
+            if command:
+                commands.append((command, span.start_ms))
+        if len(commands) == 1:
+            self.send_command(commands[0][0], trace_id, captured)
+            return [commands[0][0]]
+        if not commands:
+            return []
+        print(f"切分指令: {' / '.join(command for command, _ in commands)}")
+        offset = 0.0
+        previous_ms = commands[0][1]
+        for command, start_ms in commands:
+            if SEGMENTER_CONFIG['KEEP_TIMING'] and start_ms is not None and previous_ms is not None:
+                offset += min(start_ms - previous_ms, SEGMENTER_CONFIG['MAX_GAP_MS']) / 1000
+                previous_ms = start_ms
+            # 后面的指令本来就该晚点执行，过期判断也从它该执行的时刻算起
+            self.send_command(command, trace_id, None if captured is None else captured + offset, offset)
+        return [command for command, _ in commands]
+
+    def send_command(self, command, trace_id=None, captured=None, offset=None):
+        """把指令送入执行队列，captured 缺省为当前时刻"""
+        self.tracer.stamp(trace_id, MATCH, command=command)
+        captured = time.monotonic() if captured is None else captured
+        self.command_queue.put(CommandRequest(command, trace_id, captured, offset))
+
+    def fuzzy_lookup(self, text):
+        """按读音找最近的指令，找不到返回 None"""
+        if self.phonetic_index is None or not text:
+            return None
+        match = self.phonetic_index.lookup(text)
+        if match is None:
+            print(f"未匹配: {text}")
+            return None
+        command, distance = match
+        print(f"模糊匹配: {text} -> {command} (距离{distance})")
+        return command
+
+
+class StreamingSpeechRecognition(SpeechRecognition):
+    """流式语音识别，边收音频边解码并发布部分结果"""
+
+    def __init__(self, audio_queue: Queue, command_queue: Queue, stop_event: Event, ready_event: Event = None,
+                 placement_queue: Queue = None, trace_queue: Queue = None, library_path=None, metrics=None,
+                 heartbeat=None, active_event: Event = None):
+        super().__init__(audio_queue, command_queue, stop_event, ready_event, placement_queue, trace_queue,
+                         library_path, metrics, heartbeat, active_event)
+        self.matcher = self.create_matcher()
+        self.matched = False  # 本句话是否已经匹配到过指令
+        self.hypothesis = ''  # 当前这句话已解码出的文本
+        self.utterance_start = None
+        self.chunk_captured = None  # 最近送入模型的一块音频的采集时刻(monotonic)，作为指令的采集时刻
+        # 流式模式下采集端不断句，语音编号在这里按句分配
+        self.utterances = 0
+        self.trace_id = None
+        self.speculated = None  # 最近一次发出推测请求时的候选集合，避免重复发送
+
+    def create_matcher(self):
+        return PrefixCommandMatcher(
+            self.library.mapping.keys(),
+            extension_timeout_ms=MATCHER_CONFIG['EXTENSION_TIMEOUT_MS'],
+            min_commit_chars=MATCHER_CONFIG['MIN_COMMIT_CHARS'],
+        )
+
+    def apply_library(self, library):
+        # 流式模型不用热词，只换匹配表
+        self.library = library
+        self.phonetic_index = library.phonetic_index
+        self.matcher = self.create_matcher()
+
+    def create_model(self):
+        return funASR_streaming.FunASRStreaming(
+            chunk_size=STREAMING_CONFIG['CHUNK_SIZE'],
+            encoder_chunk_look_back=STREAMING_CONFIG['ENCODER_CHUNK_LOOK_BACK'],
+            decoder_chunk_look_back=STREAMING_CONFIG['DECODER_CHUNK_LOOK_BACK'],
+        )
+
+    def start(self):
+        """启动流式语音识别进程"""
+        print("流式语音识别进程启动")
+        self.load_model()
+        self.watch_library()
+
+        while not self.stop_event.is_set():
+            if self.utterance_start is None:
+                # 一句话说到一半不换匹配表
+                self.apply_pending_library()
+            if not self.wait_active():
+                continue
+            try:
+                # 超时要短于匹配器的等待时间，才能及时提交等待扩展的指令
+                audio_chunk, is_final, captured = self.audio_queue.get(timeout=0.01)
+                self.process_chunk(audio_chunk, is_final, captured)
+            except Empty:
+                pass
+            self.dispatch(self.matcher.poll())
+
+    def process_chunk(self, audio_chunk, is_final, captured=None):
+        """处理一个音频小块，captured 为采集端给出的采集时刻，缺省为当前时刻"""
+        if self.utterance_start is None:
+            self.utterance_start = time.time()
+            self.utterances += 1
+            self.trace_id = self.utterances
+            self.tracer.stamp(self.trace_id, DEQUEUE)
+        # 识别跟不上、音频在队列里积压时，采集时刻会越来越落后，执行端据此按 TTL 丢弃迟到的指令
+        self.chunk_captured = time.monotonic() if captured is None else captured
+
+        for text in self.model.feed(audio_chunk, is_final):
+            self.hypothesis += text
+            self.on_partial(self.hypothesis)
+
+        if is_final:
+            print(f"最终结果: {self.hypothesis} 用时: {time.time() - self.utterance_start:.4f}秒")
+            self.metrics.inc('voice_recognized_segments_total')
+            self.dispatch(self.matcher.finish())
+            if not self.matched:
+                # 前缀匹配整句都没命中，再按读音兜底
+                command = self.fuzzy_lookup(self.hypothesis)
+                if command:
+                    self.dispatch([command])
+                elif self.hypothesis:
+                    self.metrics.inc('voice_unmatched_total')
+            self.matched = False
+            self.hypothesis = ''
+            self.utterance_start = None
+            self.chunk_captured = None
+            self.trace_id = None
+            self.speculated = None
+
+    def on_partial(self, hypothesis):
+        """发布部分识别结果，前缀已唯一的指令立即下发"""
+        print(f"部分结果: {hypothesis}")
+        self.dispatch(self.matcher.feed(hypothesis))
+        if SPECULATION_CONFIG['ENABLED']:
+            self.speculate()
+
+    def speculate(self):
+        """还剩多条候选指令时通知执行端，先输入它们共同的前缀"""
+        candidates = self.matcher.candidates()
+        if len(candidates) < 2 or candidates == self.speculated:
+            return
+        self.speculated = candidates
+        request = SpeculationRequest(tuple(sorted(candidates)), self.trace_id, self.chunk_captured)
+        try:
+            self.command_queue.put_nowait(request)
+        except Full:
+            pass
+
+    def dispatch(self, commands):
+        """把匹配到的指令送入执行队列"""
+        for command in commands:
+            self.matched = True
+            self.speculated = None
+            if self.utterance_start is not None:
+                print(f"匹配指令: {command} 用时: {time.time() - self.utterance_start:.4f}秒")
+            self.send_command(command, self.trace_id, self.chunk_captured)
@@ -0,0 +1,200 @@
+import time
+import multiprocessing as mp
+
+from config import SUPERVISOR_CONFIG, RECOGNITION_CONFIG
+
+
+class Heartbeat:
+    """一个阶段的心跳，存在共享内存里: 最近一次心跳时刻、当前推理开始的时刻（0 表示不在推理）
+
+    时间统一用 time.monotonic。shared=False 时不分配共享内存，所有操作都是空操作。
+    """
+
+    def __init__(self, shared=True):
+        self.values = mp.Array('d', 2, lock=False) if shared else None
+
+    def beat(self):
+        if self.values is not None:
+            self.values[0] = time.monotonic()
+
+    def busy(self):
+        """进入一次可能卡住的调用（模型推理）"""
+        if self.values is not None:
+            self.values[1] = time.monotonic()
+
+    def idle(self):
+        if self.values is not None:
+            self.values[1] = 0.0
+
+    @property
+    def last(self):
+        return self.values[0] if self.values is not None else 0.0
+
+    @property
+    def busy_since(self):
+        return self.values[1] if self.values is not None else 0.0
+
+
+# 不受监管时各阶段共用的空实现
+NULL_HEARTBEAT = Heartbeat(shared=False)
+
+
+class Worker:
+    """受监管的一个子进程: 进程对象、心跳、就绪与激活事件"""
+
+    def __init__(self, name, active=True):
+        self.name = name
+        self.heartbeat = Heartbeat()
+        self.ready_event = mp.Event()
+        self.active_event = mp.Event()
+        if active:
+            self.active_event.set()
+        self.process = None
+        self.started = None
+        self.ready_seen = None  # 主管第一次看到 ready_event 的时刻
+
+    def start(self, stage):
+        self.process = mp.Process(target=stage.start)
+        self.process.start()
+        self.started = time.monotonic()
+
+    def kill(self):
+        """结束进程，先 terminate，不退出再 kill"""
+        if self.process is None or not self.process.is_alive():
+            return
+        self.process.terminate()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+
+
+class Supervisor:
+    """在主进程里监管采集和识别进程，执行线程不受影响
+
+    - 识别进程: 进程退出、心跳超时或单次推理超过 INFERENCE_TIMEOUT_S 视为故障，结束它，
+      由预先加载并预热好的热备识别进程接管 audio_queue（只需设置一个事件），再在后台准备新的热备；
+      没有热备时冷启动一个新的识别进程
+    - 采集进程: 进程退出或音频回调停止超过 CAPTURE_TIMEOUT_S 时重启，已排队的语音不受影响
+
+    make_recognition(ready_event, active_event, heartbeat) 和 make_capture(heartbeat) 返回新的阶段对象。
+    被结束的识别进程手里正在处理的语音段会丢失。识别进程读队列带超时，空闲时每轮都会心跳，
+    心跳停止说明它卡在了推理之外的地方（也可能是队列内部），这时同样会结束它；
+    若恰好持有队列的锁，锁会随进程一起丢失。
+    """
+
+    def __init__(self, stop_event, make_recognition, make_capture, standby=None):
+        self.stop_event = stop_event
+        self.make_recognition = make_recognition
+        self.make_capture = make_capture
+        self.standby_enabled = SUPERVISOR_CONFIG['STANDBY'] if standby is None else standby
+        self.recognizer = None
+        self.standby = None
+        self.capture = None
+        self.failovers = 0
+        self.capture_restarts = 0
+
+    def start(self):
+        """启动识别进程并等待就绪，再启动热备和采集进程"""
+        self.recognizer = self.spawn_recognizer('识别', active=True)
+        start_time = time.time()
+        while not self.recognizer.ready_event.wait(0.5):
+            if not self.recognizer.process.is_alive():
+                raise RuntimeError("语音识别进程启动失败")
+            if time.time() - start_time > RECOGNITION_CONFIG['READY_TIMEOUT_S']:
+                raise RuntimeError("等待语音识别进程就绪超时")
+        print(f"语音识别就绪，等待 {time.time() - start_time:.2f}秒")
+        if self.standby_enabled:
+            self.standby = self.spawn_recognizer('热备识别', active=False)
+        self.capture = self.spawn_capture()
+
+    def spawn_recognizer(self, name, active):
+        worker = Worker(name, active)
+        worker.start(self.make_recognition(worker.ready_event, worker.active_event, worker.heartbeat))
+        return worker
+
+    def spawn_capture(self):
+        worker = Worker('采集')
+        worker.start(self.make_capture(worker.heartbeat))
+        return worker
+
+    def run(self):
+        """定期检查各阶段，直到 stop_event 被设置"""
+        while not self.stop_event.wait(SUPERVISOR_CONFIG['CHECK_INTERVAL_S']):
+            self.check()
+
+    def check(self):
+        now = time.monotonic()
+        reason = self.recognizer_fault(self.recognizer, now)
+        if reason is not None:
+            self.failover(reason)
+        if self.standby is not None and not self.standby.process.is_alive():
+            print(f"热备识别进程退出(exitcode={self.standby.process.exitcode})，重新准备")
+            time.sleep(SUPERVISOR_CONFIG['RESTART_BACKOFF_S'])
+            self.standby = self.spawn_recognizer('热备识别', active=False)
+        reason = self.capture_fault(self.capture, now)
+        if reason is not None:
+            self.restart_capture(reason)
+
+    def recognizer_fault(self, worker, now):
+        """返回故障原因，正常时返回 None"""
+        if not worker.process.is_alive():
+            return f"进程退出(exitcode={worker.process.exitcode})"
+        if not worker.ready_event.is_set():
+            # 还在加载模型，没有心跳
+            return None
+        if worker.ready_seen is None:
+            worker.ready_seen = now
+        busy_since = worker.heartbeat.busy_since
+        if busy_since and now - busy_since > SUPERVISOR_CONFIG['INFERENCE_TIMEOUT_S']:
+            return f"推理超过 {now - busy_since:.1f}秒"
+        # 与采集进程一样，至少从看到就绪的时刻起算，刚就绪还没进主循环时不算心跳停止
+        last = max(worker.heartbeat.last, worker.ready_seen)
+        if not busy_since and now - last > SUPERVISOR_CONFIG['HEARTBEAT_TIMEOUT_S']:
+            return f"心跳停止 {now - last:.1f}秒"
+        return None
+
+    def capture_fault(self, worker, now):
+        if not worker.process.is_alive():
+            return f"进程退出(exitcode={worker.process.exitcode})"
+        last = max(worker.heartbeat.last, worker.started)
+        if now - last > SUPERVISOR_CONFIG['CAPTURE_TIMEOUT_S']:
+            return f"音频回调停止 {now - last:.1f}秒"
+        return None
+
+    def failover(self, reason):
+        """结束故障的识别进程，有就绪的热备时立即切换"""
+        start = time.monotonic()
+        failed = self.recognizer
+        failed.kill()
+        self.failovers += 1
+        standby = self.standby
+        if standby is not None and standby.ready_event.is_set() and standby.process.is_alive():
+            standby.active_event.set()
+            self.recognizer = standby
+            self.standby = self.spawn_recognizer('热备识别', active=False)
+            print(f"{failed.name}进程故障: {reason}，热备已接管，切换用时 {(time.monotonic() - start) * 1000:.1f}ms")
+        else:
+            # 没有可用的热备，只能冷启动；新进程加载完模型后自行开始取音频
+            time.sleep(SUPERVISOR_CONFIG['RESTART_BACKOFF_S'])
+            self.recognizer = self.spawn_recognizer('识别', active=True)
+            print(f"{failed.name}进程故障: {reason}，没有就绪的热备，重新加载模型")
+
+    def restart_capture(self, reason):
+        self.capture.kill()
+        self.capture_restarts += 1
+        print(f"采集进程故障: {reason}，重启")
+        time.sleep(SUPERVISOR_CONFIG['RESTART_BACKOFF_S'])
+        self.capture = self.spawn_capture()
+
+    def workers(self):
+        return [w for w in (self.capture, self.recognizer, self.standby) if w is not None and w.process is not None]
+
+    def shutdown(self):
+        """stop_event 设置后调用，等各进程退出，超时的强制结束"""
+        for worker in self.workers():
+            worker.process.join(timeout=2)
+        for worker in self.workers():
+            worker.kill()
+        if self.failovers or self.capture_restarts:
+            print(f"运行期间识别切换 {self.failovers} 次，采集重启 {self.capture_restarts} 次")
@@ -0,0 +1,105 @@
+import sys
+import os
+import glob
+import time
+import wave
+import argparse
+import multiprocessing as mp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_segment import pcm_to_float
+from command_matcher import normalize_text
+from command_library import load_library
+from config import ASR_CONFIG, RECORDING_LABELS
+
+# 对比各推理后端在本地录音上的实时率(RTF)、峰值内存和准确率
+# 用法: python test/backend_benchmark.py [--backends torch onnx] [--repeat 3]
+
+
+def label_of(path):
+    """由文件名取标注，如 recordings/2mk_t.wav -> 下中脚，没有标注返回 None"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem.endswith('_t'):
+        stem = stem[:-2]
+    return RECORDING_LABELS.get(stem)
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）"""
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return usage / 1024 / (1024 if sys.platform == 'darwin' else 1)
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+
+
+def run_backend(backend, paths, repeat, result_queue):
+    """在独立进程里测一个后端，保证峰值内存互不影响"""
+    import funASR_no_streaming
+    config = dict(ASR_CONFIG, BACKEND=backend)
+    model = funASR_no_streaming.FunASR(keywords=load_library().mapping.keys(), backend_config=config)
+
+    samples = []
+    for path in paths:
+        with wave.open(path, 'rb') as wav_file:
+            samples.append(pcm_to_float(wav_file.readframes(-1)))
+    model.generate(samples[0])  # 预热
+
+    audio_seconds = 0.0
+    decode_seconds = 0.0
+    correct = labeled = 0
+    for _ in range(repeat):
+        for path, sample in zip(paths, samples):
+            start_time = time.perf_counter()
+            res = model.generate(sample)
+            decode_seconds += time.perf_counter() - start_time
+            audio_seconds += len(sample) / 16000
+            label = label_of(path)
+            if label is not None:
+                labeled += 1
+                text = normalize_text(res[0]['text']) if res else ''
+                correct += text == normalize_text(label)
+    result_queue.put({
+        'backend': backend,
+        'load': model.timings['load'],
+        'rtf': decode_seconds / audio_seconds,
+        'rss': peak_rss_mb(),
+        'accuracy': correct / labeled if labeled else None,
+        'labeled': labeled // repeat,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推理后端对比")
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--files', default=os.path.join(ROOT, 'recordings', '*.wav'))
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.files))
+    print(f"录音 {len(paths)} 条，每个后端重复 {args.repeat} 轮")
+    result_queue = mp.Queue()
+    rows = []
+    for backend in args.backends:
+        process = mp.Process(target=run_backend, args=(backend, paths, args.repeat, result_queue))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{backend}: 运行失败 (exit {process.exitcode})")
+            continue
+        rows.append(result_queue.get())
+
+    print(f"{'后端':<8}{'加载(秒)':>10}{'RTF':>10}{'峰值内存(MB)':>14}{'准确率':>10}")
+    for row in rows:
+        accuracy = f"{row['accuracy']:.0%}" if row['accuracy'] is not None else '-'
+        print(f"{row['backend']:<8}{row['load']:>10.2f}{row['rtf']:>10.3f}{row['rss']:>14.0f}"
+              f"{accuracy:>10}  ({row['labeled']}条有标注)")
+
+
+if __name__ == "__main__":
+    main()
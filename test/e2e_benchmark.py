@@ -0,0 +1,274 @@
+import sys
+import os
+import glob
+import json
+import math
+import time
+import wave
+import bisect
+import argparse
+import threading
+import multiprocessing as mp
+from queue import Empty
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_capture import AudioCapture
+from audio_source import WavReplaySource
+from command_executor import CommandExecutor
+from command_compiler import command_keys
+from command_library import load_library
+from key_output import RecordingOutput
+from shared_audio import SharedAudioQueue
+from speech_recognition import SpeechRecognition, StreamingSpeechRecognition
+from latency_trace import ONSET, DEQUEUE, ENDPOINT, MATCH, FIRST_PRESS
+from backend_benchmark import label_of
+from config import AUDIO_CONFIG, TRANSPORT_CONFIG, RECOGNITION_CONFIG
+
+# 端到端基准: 回放本地录音，走完整的 采集 -> 识别 -> 执行 链路，按键只记录在内存里
+# 统计 说完到按下 的延迟分位数、按文件名标注的准确率和吞吐，与保存的基线对比，退化时返回非零
+# 用法: python test/e2e_benchmark.py [--modes realtime fast] [--streaming] [--update-baseline]
+
+BASELINE_PATH = os.path.join(ROOT, 'test', 'e2e_baseline.json')
+IDLE_S = 2.0  # 回放结束后这么久没有新的打点，认为链路已经排空
+LATENCY_SLACK_MS = 10.0  # 延迟对比时额外允许的绝对误差，样本少时分位数抖动较大
+
+
+def percentile(values, p):
+    """最近秩法取分位数，values 已排序"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def duration_of(path):
+    with wave.open(path, 'rb') as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
+
+
+def run_pipeline(paths, realtime, streaming):
+    """跑一遍完整链路，返回 (各文件的回放区间, 各语音的打点, 记录下的按键, 耗时秒)"""
+    if streaming:
+        audio_queue = mp.Queue(maxsize=1000)
+    elif TRANSPORT_CONFIG['SHARED_MEMORY']:
+        capacity = int(AUDIO_CONFIG['RATE'] * 2 * TRANSPORT_CONFIG['RING_SECONDS'])
+        audio_queue = SharedAudioQueue(capacity, maxsize=TRANSPORT_CONFIG['MAX_SEGMENTS'])
+    else:
+        audio_queue = mp.Queue(maxsize=TRANSPORT_CONFIG['MAX_SEGMENTS'])
+    command_queue = mp.Queue(maxsize=10)
+    trace_queue = mp.Queue()
+    played_queue = mp.Queue()
+    stop_event = mp.Event()
+    ready_event = mp.Event()
+    done_event = mp.Event()
+
+    output = RecordingOutput(command_keys(load_library().compiled))
+    executor = CommandExecutor(command_queue, stop_event, trace_queue=trace_queue, output=output)
+    recognition_class = StreamingSpeechRecognition if streaming else SpeechRecognition
+    recognition = recognition_class(audio_queue, command_queue, stop_event, ready_event, trace_queue=trace_queue)
+    source = WavReplaySource(paths, realtime=realtime, done_event=done_event, played_queue=played_queue)
+    capture = AudioCapture(audio_queue, stop_event, streaming=streaming, trace_queue=trace_queue, source=source)
+
+    traces = {}
+
+    def drain(timeout):
+        """收一条打点，返回是否收到"""
+        try:
+            trace_id, stage, t, pid, args = trace_queue.get(timeout=timeout)
+        except Empty:
+            return False
+        trace = traces.setdefault(trace_id, {'commands': []})
+        trace.setdefault(stage, t)
+        if stage == ONSET:
+            trace['position'] = args.get('position')
+        elif stage == MATCH:
+            trace['commands'].append(args['command'])
+        return True
+
+    audio_process = recognition_process = command_thread = None
+    try:
+        recognition_process = mp.Process(target=recognition.start)
+        recognition_process.start()
+        start_time = time.time()
+        while not ready_event.wait(0.5):
+            if not recognition_process.is_alive():
+                raise RuntimeError("语音识别进程启动失败")
+            if time.time() - start_time > RECOGNITION_CONFIG['READY_TIMEOUT_S']:
+                raise RuntimeError("等待语音识别进程就绪超时")
+
+        command_thread = threading.Thread(target=executor.start)
+        command_thread.start()
+        audio_process = mp.Process(target=capture.start)
+        wall_start = time.monotonic()
+        audio_process.start()
+
+        while not done_event.is_set():
+            if not audio_process.is_alive():
+                raise RuntimeError("音频回放进程异常退出")
+            drain(0.1)
+        while drain(IDLE_S):
+            pass
+        wall_seconds = time.monotonic() - wall_start - IDLE_S
+    finally:
+        stop_event.set()
+        for worker in (audio_process, recognition_process, command_thread):
+            if worker is not None:
+                worker.join(timeout=2)
+        for process in (audio_process, recognition_process):
+            if process is not None and process.is_alive():
+                process.terminate()
+        if isinstance(audio_queue, SharedAudioQueue):
+            audio_queue.close()
+            audio_queue.unlink()
+
+    played = []
+    while True:
+        try:
+            played.append(played_queue.get(timeout=0.1))
+        except Empty:
+            break
+    return sorted(played, key=lambda p: p[1]), traces, output, wall_seconds
+
+
+def evaluate(played, traces, output, wall_seconds):
+    """把每条语音归到它所在的录音文件，计算延迟、准确率和吞吐
+
+    非流式链路按采集端的字节位置归属，与回放快慢无关；流式链路没有位置信息，按识别进程取到首块的时间归属。
+    """
+    positions = [p[3] for p in played]
+    starts = [p[1] for p in played]
+    per_file = {p[0]: [] for p in played}
+    latencies = []
+    endpoint_latencies = []
+    for trace in traces.values():
+        if trace.get('position') is not None:
+            # 预录会让起点略早于文件开始，放宽一点再找
+            margin = AUDIO_CONFIG['RATE'] * 2 * AUDIO_CONFIG['PRE_ROLL_MS'] // 1000
+            index = bisect.bisect_right(positions, trace['position'] + margin) - 1
+        elif DEQUEUE in trace:
+            index = bisect.bisect_right(starts, trace[DEQUEUE]) - 1
+        else:
+            continue
+        if index < 0:
+            continue
+        path, _, speech_end = played[index][:3]
+        per_file[path].extend(trace['commands'])
+        if FIRST_PRESS in trace:
+            latencies.append((trace[FIRST_PRESS] - speech_end) * 1000)
+            if ENDPOINT in trace:
+                endpoint_latencies.append((trace[FIRST_PRESS] - trace[ENDPOINT]) * 1000)
+
+    correct = labeled = 0
+    for path, commands in per_file.items():
+        label = label_of(path)
+        if label is None:
+            continue
+        labeled += 1
+        if commands == [label]:
+            correct += 1
+        else:
+            print(f"  {os.path.basename(path)}: 期望 {label}，实际 {commands or '无'}")
+
+    latencies.sort()
+    endpoint_latencies.sort()
+    audio_seconds = sum(duration_of(p[0]) for p in played)
+    return {
+        'files': len(played),
+        'commands': sum(len(c) for c in per_file.values()),
+        'key_events': len(output.events),
+        'p50_ms': percentile(latencies, 50),
+        'p90_ms': percentile(latencies, 90),
+        'p99_ms': percentile(latencies, 99),
+        'endpoint_p50_ms': percentile(endpoint_latencies, 50),
+        'accuracy': correct / labeled if labeled else None,
+        'labeled': labeled,
+        # 每秒墙钟时间处理的音频秒数，回放越快越能看出识别的上限
+        'throughput': audio_seconds / wall_seconds if wall_seconds > 0 else None,
+    }
+
+
+def compare(name, result, baseline, tolerance, accuracy_drop):
+    """与基线对比，返回退化项列表"""
+    failures = []
+    for key in ('p50_ms', 'p90_ms', 'p99_ms'):
+        if result.get(key) is None or baseline.get(key) is None:
+            continue
+        limit = baseline[key] * (1 + tolerance) + LATENCY_SLACK_MS
+        if result[key] > limit:
+            failures.append(f"{name} {key} {result[key]:.1f} > {limit:.1f}")
+    if result.get('accuracy') is not None and baseline.get('accuracy') is not None:
+        if result['accuracy'] < baseline['accuracy'] - accuracy_drop - 1e-9:
+            failures.append(f"{name} 准确率 {result['accuracy']:.0%} < 基线 {baseline['accuracy']:.0%}")
+    if result.get('throughput') is not None and baseline.get('throughput') is not None:
+        limit = baseline['throughput'] * (1 - tolerance)
+        if result['throughput'] < limit:
+            failures.append(f"{name} 吞吐 {result['throughput']:.2f}x < {limit:.2f}x")
+    return failures
+
+
+def format_ms(value):
+    return f"{value:.1f}" if value is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准测试")
+    parser.add_argument('--files', default=os.path.join(ROOT, 'recordings', '*.wav'))
+    parser.add_argument('--modes', nargs='+', default=['realtime', 'fast'], choices=['realtime', 'fast'])
+    parser.add_argument('--streaming', action='store_true', help="测流式识别链路")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="用本次结果覆盖基线")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="延迟/吞吐允许的相对退化")
+    parser.add_argument('--accuracy-drop', type=float, default=0.0, help="准确率允许下降的幅度")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.files))
+    pipeline = 'streaming' if args.streaming else 'offline'
+    if args.streaming and 'fast' in args.modes:
+        # 流式链路只能按时间归属语音，快速回放时时间被压缩，无法对应到文件
+        print("流式链路只支持 realtime 回放，已忽略 fast")
+        args.modes = [m for m in args.modes if m != 'fast'] or ['realtime']
+    print(f"录音 {len(paths)} 条，链路: {pipeline}")
+
+    results = {}
+    for mode in args.modes:
+        print(f"[{mode}] 回放中...")
+        played, traces, output, wall_seconds = run_pipeline(paths, mode == 'realtime', args.streaming)
+        results[f"{pipeline}/{mode}"] = evaluate(played, traces, output, wall_seconds)
+
+    print(f"{'场景':<20}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'断句到按下p50':>16}{'准确率':>8}{'吞吐':>8}")
+    for name, row in results.items():
+        accuracy = f"{row['accuracy']:.0%}" if row['accuracy'] is not None else '-'
+        throughput = f"{row['throughput']:.2f}x" if row['throughput'] is not None else '-'
+        print(f"{name:<20}{format_ms(row['p50_ms']):>10}{format_ms(row['p90_ms']):>10}{format_ms(row['p99_ms']):>10}"
+              f"{format_ms(row['endpoint_p50_ms']):>16}{accuracy:>8}{throughput:>8}"
+              f"  ({row['commands']}条指令/{row['key_events']}个按键事件，{row['labeled']}条有标注)")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    if args.update_baseline:
+        baselines.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+        return
+
+    failures = []
+    for name, row in results.items():
+        if name not in baselines:
+            print(f"{name}: 没有基线，跳过对比（可用 --update-baseline 生成）")
+            continue
+        failures += compare(name, row, baselines[name], args.tolerance, args.accuracy_drop)
+    if failures:
+        print("性能退化:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("与基线对比通过")
+
+
+if __name__ == "__main__":
+    main()
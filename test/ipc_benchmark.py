@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_segment import AudioSegment
+from shared_audio import SharedAudioQueue
+
+# 对比音频段经 mp.Queue(pickle) 和共享内存传输的单段开销
+SEGMENT_SECONDS = 1.5
+SEGMENTS = 500
+RATE = 16000
+
+
+def consume(audio_queue, result_queue, count):
+    """识别进程一侧: 取出语音段并读一遍数据，记录从发送到可用的耗时"""
+    costs = []
+    for _ in range(count):
+        segment = audio_queue.get()
+        # 模拟识别前对数据的访问
+        checksum = sum(segment.pcm[::4096])
+        costs.append(time.monotonic() - segment.endpoint)
+    result_queue.put(costs)
+
+
+def run(name, audio_queue):
+    pcm = os.urandom(int(RATE * 2 * SEGMENT_SECONDS))
+    result_queue = mp.Queue()
+    consumer = mp.Process(target=consume, args=(audio_queue, result_queue, SEGMENTS))
+    consumer.start()
+    put_costs = []
+    for _ in range(SEGMENTS):
+        start = time.monotonic()
+        audio_queue.put(AudioSegment(pcm, start, start))
+        put_costs.append(time.monotonic() - start)
+        # 与实际说话节奏无关，这里只留出时间让消费者跟上
+        time.sleep(0.002)
+    costs = sorted(result_queue.get())
+    consumer.join()
+    put_costs.sort()
+    print(f"{name}: 发送端 p50 {put_costs[len(put_costs) // 2] * 1e6:.1f}us | "
+          f"端到端 p50 {costs[len(costs) // 2] * 1e6:.1f}us p99 {costs[int(len(costs) * 0.99)] * 1e6:.1f}us")
+
+
+if __name__ == "__main__":
+    print(f"每段 {SEGMENT_SECONDS}秒 ({int(RATE * 2 * SEGMENT_SECONDS)} 字节)，共 {SEGMENTS} 段")
+    run("mp.Queue", mp.Queue(maxsize=100))
+    shared_queue = SharedAudioQueue(RATE * 2 * 30, maxsize=100)
+    try:
+        run("共享内存", shared_queue)
+    finally:
+        shared_queue.close()
+        shared_queue.unlink()
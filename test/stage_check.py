@@ -0,0 +1,124 @@
+import sys
+import os
+import time
+import threading
+from queue import Queue
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_segment import AudioSegment
+from command_compiler import command_keys
+from command_executor import CommandExecutor
+from command_library import load_library
+from command_request import CommandRequest, SpeculationRequest
+from key_output import RecordingOutput
+from speech_recognition import SpeechRecognition
+from supervisor import Supervisor, Worker
+from latency_trace import INFERENCE_START, INFERENCE_END
+from config import MATCHER_CONFIG, SPECULATION_CONFIG, SUPERVISOR_CONFIG
+
+# 各阶段的快速自检，不加载模型，模型和关键词检测用替身对象代替
+# 用法: python test/stage_check.py
+
+
+class StubSpotter:
+    """只认 spot 指定的段，其余返回 None 交给完整识别"""
+
+    def __init__(self, spot):
+        self.spot = spot
+
+    def detect(self, pcm):
+        return self.spot.get(bytes(pcm[:2]))
+
+
+class StubModel:
+    def __init__(self, text):
+        self.text = text
+
+    def generate_batch(self, pcms):
+        return [{'key': 'stub', 'text': self.text} for _ in pcms]
+
+
+def segment(marker, trace_id):
+    now = time.monotonic()
+    pcm = bytes([marker, 0]) + np.zeros(1600, dtype=np.int16).tobytes()
+    return AudioSegment(pcm, now - 0.3, now, trace_id)
+
+
+def check_kws_stage():
+    """关键词命中的段直接出指令，其余段走完整识别；开着延迟追踪时打点不应出错"""
+    command_queue = Queue()
+    trace_queue = Queue()
+    recognition = SpeechRecognition(Queue(), command_queue, threading.Event(), trace_queue=trace_queue)
+    names = list(recognition.library.mapping)
+    recognition.spotter = StubSpotter({bytes([1, 0]): (names[0], 0.9)})
+    recognition.model = StubModel(names[1])
+
+    recognition.process_audio([segment(1, 1), segment(2, 2)])
+
+    sent = [command_queue.get_nowait() for _ in range(command_queue.qsize())]
+    assert [(request.name, request.trace_id) for request in sent] == [(names[0], 1), (names[1], 2)], sent
+    stamps = [trace_queue.get_nowait() for _ in range(trace_queue.qsize())]
+    kws = [(trace_id, stage) for trace_id, stage, _, _, args in stamps if args.get('model') == 'kws']
+    assert kws == [(1, INFERENCE_START), (1, INFERENCE_END), (2, INFERENCE_START), (2, INFERENCE_END)], kws
+    print("关键词检测阶段: 通过")
+
+
+def run_speculation(candidates, final):
+    """推测输入候选指令的共同前缀，最终指令按匹配器的扩展等待时间迟到，返回各按键被按下的次数"""
+    output = RecordingOutput(command_keys(load_library().compiled))
+    executor = CommandExecutor(None, threading.Event(), output=output)
+    delay = (MATCHER_CONFIG['EXTENSION_TIMEOUT_MS'] + 5) / 1000
+    late = threading.Timer(delay, executor.pending.put, (CommandRequest(final, 1, time.monotonic() + delay),))
+    late.start()
+    executor.handle(SpeculationRequest(candidates, 1, time.monotonic()))
+    executor.handle(executor.pending.get(timeout=1))
+    late.join()
+    presses = {}
+    for _, action, key in output.events:
+        if action == 'press':
+            presses[key] = presses.get(key, 0) + 1
+    assert not executor.held
+    return presses
+
+
+def check_speculation_extension():
+    """候选里有一条指令就是共同前缀本身(中拳/中拳重拳)时，迟到的最终指令不应把前缀再输入一遍"""
+    presses = run_speculation(('中拳', '中拳重拳'), '中拳')
+    assert presses == {'i': 1}, presses
+    presses = run_speculation(('中拳', '中拳重拳'), '中拳重拳')
+    assert presses == {'i': 1, 'o': 1}, presses
+    print("推测执行的扩展等待: 通过")
+
+
+class AliveProcess:
+    exitcode = None
+
+    def is_alive(self):
+        return True
+
+
+def check_supervisor_ready_window():
+    """识别进程刚就绪、还没来得及心跳时不应被判为心跳停止，之后真的停止心跳才算故障"""
+    supervisor = Supervisor(threading.Event(), None, None)
+    worker = Worker('识别')
+    worker.process = AliveProcess()
+    now = time.monotonic()
+    assert supervisor.recognizer_fault(worker, now) is None
+    worker.ready_event.set()
+    assert worker.heartbeat.last == 0.0
+    assert supervisor.recognizer_fault(worker, now) is None
+    later = now + SUPERVISOR_CONFIG['HEARTBEAT_TIMEOUT_S'] + 0.5
+    assert supervisor.recognizer_fault(worker, later).startswith('心跳停止')
+    worker.heartbeat.beat()
+    assert supervisor.recognizer_fault(worker, time.monotonic()) is None
+    print("主管就绪窗口: 通过")
+
+
+if __name__ == "__main__":
+    check_kws_stage()
+    check_speculation_extension()
+    check_supervisor_ready_window()